@@ -3,18 +3,25 @@ import os
 import pandas as pd
 from snowflake.connector.errors import DatabaseError
 import logging
-import sys
+import time
+
+POLL_INTERVAL = 2
 
 class SnowflakeQuery():
 
-    def fetch_query(self, query) -> pd.DataFrame:
-        
-        try:
-            ctx = snowflake.connector.connect(
+    ctx = None
+
+    def _connect(self):
+        return snowflake.connector.connect(
             user=os.environ['SNOWFLAKE_USER'],
             password=os.environ['SNOWFLAKE_PW'],
             account=os.environ['SNOWFLAKE_ACCOUNT']
             )
+
+    def fetch_query(self, query) -> pd.DataFrame:
+        
+        try:
+            ctx = self._connect()
             cs = ctx.cursor()
             cs.execute(query)
             results = cs.fetch_pandas_all()
@@ -23,11 +30,58 @@ class SnowflakeQuery():
             logging.error('A database error occured when querying Snowflake: {0}'.format(err))
             return None
         except:
-            logging.error("Unexpected Snowflake error:", sys.exc_info()[0])
+            logging.exception('Unexpected Snowflake error')
             return None
 
         finally:
             cs.close()
         ctx.close()
         return results
-        
\ No newline at end of file
+
+    def submit_query(self, query) -> str:
+        """ starts the query on Snowflake without waiting for its results.
+        Returns:
+            the query id to pass to fetch_query_results, or None if the query could not be started.
+        """
+        try:
+            self.ctx = self._connect()
+            cs = self.ctx.cursor()
+            cs.execute_async(query)
+            query_id = cs.sfqid
+            cs.close()
+        except DatabaseError as err:
+            logging.error('A database error occured when querying Snowflake: {0}'.format(err))
+            self._close()
+            return None
+        except:
+            logging.exception('Unexpected Snowflake error')
+            self._close()
+            return None
+        return query_id
+
+    def _close(self):
+        if self.ctx is not None:
+            self.ctx.close()
+            self.ctx = None
+
+    def fetch_query_results(self, query_id) -> pd.DataFrame:
+        """ waits for a query started with submit_query and returns its results. """
+        if query_id is None:
+            self._close()
+            return None
+        try:
+            while self.ctx.is_still_running(self.ctx.get_query_status_throw_if_error(query_id)):
+                time.sleep(POLL_INTERVAL)
+            cs = self.ctx.cursor()
+            cs.get_results_from_sfqid(query_id)
+            results = cs.fetch_pandas_all()
+            cs.close()
+        except DatabaseError as err:
+            logging.error('A database error occured when querying Snowflake: {0}'.format(err))
+            return None
+        except:
+            logging.exception('Unexpected Snowflake error')
+            return None
+        finally:
+            self._close()
+        return results
@@ -1,15 +1,12 @@
-from typing import List
-import os
+import utils
 
 MAIN_PATH = '/Users/tomevers/projects/airglow'
-USAGE_CHART_TEMPLATE = 'templates/usage_chart.md'
+USAGE_CHART_LAZY_TEMPLATE = 'templates/usage_chart_lazy.md'
 
 class UsageChartGenerator():
     usage_chart_template = None
     event_name = None
     title = None
-    x_series = None
-    y_series = None
 
     def __init__(self, event_name) -> None:
         self.usage_chart_template = self._get_usage_chart_template()
@@ -17,18 +14,15 @@ class UsageChartGenerator():
         self.title = "weekly usage for " + event_name
 
     def _get_usage_chart_template(self) -> str:
-        file_path = os.path.join(MAIN_PATH, USAGE_CHART_TEMPLATE)
-        with open(file_path, 'r') as file:
-            return file.read()
+        return utils.get_template(MAIN_PATH, USAGE_CHART_LAZY_TEMPLATE)
 
-    def add_data(self, x_series: List, y_series: List) -> None:
-        self.x_series = x_series
-        self.y_series = y_series
-
-    def generate_chart(self) -> str:
+    def generate_lazy_chart(self, data_url: str) -> str:
+        """ returns a chart that loads its data from the usage data file at data_url
+        when the page is opened, so the page itself does not change when the usage changes.
+        """
         new_chart = self.usage_chart_template
-        new_chart = new_chart.replace("{{labels}}", ', '.join(['"{}"'.format(x_value) for x_value in self.x_series]))
         new_chart = new_chart.replace("{{title}}", self.title)
-        new_chart = new_chart.replace("{{data}}", ', '.join([str(int(y_value)) for y_value in self.y_series]))
+        new_chart = new_chart.replace("{{event_name}}", self.event_name)
+        new_chart = new_chart.replace("{{data_url}}", data_url)
 
-        return new_chart
\ No newline at end of file
+        return new_chart
@@ -0,0 +1,114 @@
+/*
+ * Client side search over the sharded index written by glow/search_index.py.
+ *
+ * Only the term shards of the typed query terms (search/terms_<prefix>.json) and
+ * the doc shards of the matching ids (search/docs_<n>.json) are downloaded.
+ * SHARD_PREFIX_LENGTH, DOC_SHARD_SIZE and MIN_TERM_LENGTH must match search_index.py.
+ * The search box is styled by search.css, which is copied next to this file.
+ */
+(function () {
+  var SHARD_PREFIX_LENGTH = 2;
+  var DOC_SHARD_SIZE = 1000;
+  var MIN_TERM_LENGTH = 2;
+  var MAX_RESULTS = 20;
+
+  // the loader is served from <site root>/search/search.js
+  var script = document.currentScript;
+  var indexUrl = script.src.substring(0, script.src.lastIndexOf('/') + 1);
+  var siteUrl = indexUrl.replace(/search\/$/, '');
+
+  var shards = {};
+
+  function loadJson(file) {
+    if (!(file in shards)) {
+      shards[file] = fetch(indexUrl + file).then(function (response) {
+        return response.ok ? response.json() : {};
+      }).catch(function () { return {}; });
+    }
+    return shards[file];
+  }
+
+  function tokenize(text) {
+    return text.toLowerCase().split(/[^a-z0-9]+/).filter(function (term) {
+      return term.length >= MIN_TERM_LENGTH;
+    });
+  }
+
+  // all terms match exactly, except the last one which is matched as a prefix while typing.
+  function postings(term, isPrefix) {
+    return loadJson('terms_' + term.substring(0, SHARD_PREFIX_LENGTH) + '.json').then(function (shard) {
+      if (!isPrefix) {
+        return new Set(shard[term] || []);
+      }
+      var ids = new Set();
+      Object.keys(shard).forEach(function (candidate) {
+        if (candidate.indexOf(term) === 0) {
+          shard[candidate].forEach(function (id) { ids.add(id); });
+        }
+      });
+      return ids;
+    });
+  }
+
+  function search(query) {
+    var terms = tokenize(query);
+    if (!terms.length) {
+      return Promise.resolve([]);
+    }
+    return Promise.all(terms.map(function (term, i) {
+      return postings(term, i === terms.length - 1);
+    })).then(function (sets) {
+      var ids = Array.from(sets[0]).filter(function (id) {
+        return sets.every(function (set) { return set.has(id); });
+      }).sort(function (a, b) { return a - b; }).slice(0, MAX_RESULTS);
+      return Promise.all(ids.map(function (id) {
+        return loadJson('docs_' + Math.floor(id / DOC_SHARD_SIZE) + '.json').then(function (docs) {
+          return docs[id];
+        });
+      }));
+    }).then(function (docs) {
+      return docs.filter(Boolean);
+    });
+  }
+
+  function render(results, list) {
+    list.innerHTML = '';
+    results.forEach(function (doc) {
+      var item = document.createElement('li');
+      var link = document.createElement('a');
+      link.href = siteUrl + doc[1];
+      link.textContent = doc[0];
+      var type = document.createElement('small');
+      type.textContent = ' ' + doc[2];
+      item.appendChild(link);
+      item.appendChild(type);
+      list.appendChild(item);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    // the built-in search plugin is disabled, so the box takes its place at the end of the header.
+    var header = document.querySelector('.md-header__inner') || document.body;
+    var container = document.createElement('div');
+    container.className = 'glow-search';
+    var input = document.createElement('input');
+    input.type = 'search';
+    input.placeholder = 'Search';
+    var list = document.createElement('ul');
+    list.className = 'glow-search__results';
+    container.appendChild(input);
+    container.appendChild(list);
+    header.appendChild(container);
+
+    var latest = 0;
+    input.addEventListener('input', function () {
+      var request = ++latest;
+      search(input.value).then(function (results) {
+        // ignore results of queries that were overtaken by newer input
+        if (request === latest) {
+          render(results, list);
+        }
+      });
+    });
+  });
+})();
@@ -0,0 +1,132 @@
+from array import array
+from typing import List, Dict, Iterable, Tuple
+import bisect
+import json
+import logging
+import sys
+
+COLUMNS_FILE_SUFFIX = '.columns.json'
+
+
+def datasource_key(connection: str, project: str, name: str) -> str:
+    """ data source names are only unique within a project of a single connection. """
+    return '{}/{}/{}'.format(connection or '', project, name)
+
+
+class ColumnStore():
+    """ columnar store for the column metadata of all data sources.
+
+    Instead of a dict per column, every attribute is kept in its own list or
+    array and the columns of a data source are a contiguous row range given by
+    `offsets`. Datatypes and roles are stored as small integer codes. Column
+    names are interned and chained per name, so all columns with a given name
+    can be found across all data sources without scanning them.
+    """
+
+    datasources = None
+    offsets = None
+    names = None
+    captions = None
+    formulas = None
+    datatypes = None
+    roles = None
+
+    def __init__(self) -> None:
+        self.datasources = []
+        self.offsets = array('I', [0])
+        self.names = []
+        self.captions = []
+        self.formulas = []
+        self.datatypes = array('B')
+        self.roles = array('B')
+        self.datatype_codes = []
+        self.role_codes = []
+        self._datasource_rows = {}
+        self._first_row = {}
+        self._next_row = array('i')
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _encode(self, codes: List[str], value: str) -> int:
+        if value not in codes:
+            codes.append(value)
+        return codes.index(value)
+
+    def add_datasource(self, key: str, columns: Iterable[Tuple[str, str, str, str, str]]) -> None:
+        """ adds the columns of a data source as (name, caption, datatype, role, formula) tuples.
+        A data source that is already in the store keeps the columns that were added first.
+        """
+        if key in self._datasource_rows:
+            logging.warning('columns of data source {} were already added, skipping the duplicate.'.format(key))
+            return
+        for name, caption, datatype, role, formula in columns:
+            row = len(self.names)
+            name = sys.intern(name)
+            self.names.append(name)
+            self.captions.append(caption or '')
+            self.formulas.append(formula or '')
+            self.datatypes.append(self._encode(self.datatype_codes, datatype or ''))
+            self.roles.append(self._encode(self.role_codes, role or ''))
+            self._next_row.append(self._first_row.get(name, -1))
+            self._first_row[name] = row
+        self._datasource_rows[key] = len(self.datasources)
+        self.datasources.append(key)
+        self.offsets.append(len(self.names))
+
+    def _get_column(self, row: int) -> Dict:
+        column = {
+            'name': self.names[row],
+            'datatype': self.datatype_codes[self.datatypes[row]],
+            'role': self.role_codes[self.roles[row]]
+        }
+        if self.captions[row]:
+            column['caption'] = self.captions[row]
+        if self.formulas[row]:
+            column['formula'] = self.formulas[row]
+        return column
+
+    def get_columns(self, key: str) -> List[Dict]:
+        """ returns the columns of a single data source, e.g. to render its page. """
+        if key not in self._datasource_rows:
+            return []
+        index = self._datasource_rows[key]
+        return [self._get_column(row) for row in range(self.offsets[index], self.offsets[index + 1])]
+
+    def find(self, name: str) -> List[Tuple[str, Dict]]:
+        """ returns a (data source key, column) tuple for every column with the given name. """
+        results = []
+        row = self._first_row.get(name, -1)
+        while row != -1:
+            datasource = self.datasources[bisect.bisect_right(self.offsets, row) - 1]
+            results.append((datasource, self._get_column(row)))
+            row = self._next_row[row]
+        return list(reversed(results))
+
+    def save(self, file_path: str) -> None:
+        data = {
+            'datasources': self.datasources,
+            'offsets': self.offsets.tolist(),
+            'names': self.names,
+            'captions': self.captions,
+            'formulas': self.formulas,
+            'datatypes': self.datatypes.tolist(),
+            'roles': self.roles.tolist(),
+            'datatype_codes': self.datatype_codes,
+            'role_codes': self.role_codes
+        }
+        with open(file_path, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+
+    def load(self, file_path: str) -> None:
+        """ adds all data sources of a file written by save to this store. """
+        with open(file_path, 'r') as file:
+            data = json.load(file)
+
+        for index, key in enumerate(data['datasources']):
+            rows = range(data['offsets'][index], data['offsets'][index + 1])
+            self.add_datasource(key, ((data['names'][row],
+                                       data['captions'][row],
+                                       data['datatype_codes'][data['datatypes'][row]],
+                                       data['role_codes'][data['roles'][row]],
+                                       data['formulas'][row]) for row in rows))
@@ -0,0 +1,142 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict
+import importlib
+import inspect
+import logging
+import multiprocessing
+import os
+import time
+import yaml
+
+from column_store import COLUMNS_FILE_SUFFIX
+
+ENTRY_POINT_GROUP = 'glow.connectors'
+DEFAULT_TIMEOUT = 3600
+RESERVED_KEYS = ('type', 'timeout')
+
+BUILTIN_CONNECTORS = {
+    'tableau': 'connectors.tableau.tableau:TableauConnector',
+}
+
+
+class ConnectorNotFoundError(Exception):
+    pass
+
+
+class Connector(ABC):
+    """ interface for connector plugins.
+
+    A connector is created with the settings of its connection in the connections
+    config file (all keys except `type` and `timeout`) and returns a list of
+    definitions from fetch_definitions. Connectors that extract column metadata
+    fill a ColumnStore in `column_store`, which is stored next to the definitions.
+    `connection_name` is set to the name of the connection before fetching.
+    Third party connectors are registered under the `glow.connectors` entry point group:
+
+        entry_points={'glow.connectors': ['looker = glow_looker:LookerConnector']}
+    """
+
+    connection_name = None
+    column_store = None
+
+    @abstractmethod
+    def fetch_definitions(self) -> List[Dict]:
+        pass
+
+
+def _get_entry_points() -> Dict:
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        from importlib_metadata import entry_points
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        group = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        group = eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in group}
+
+
+def get_connector_types() -> List[str]:
+    return sorted(set(BUILTIN_CONNECTORS.keys()) | set(_get_entry_points().keys()))
+
+
+def load_connector(connector_type: str):
+    """ returns the connector class registered for the given type.
+    Connectors registered through entry points take precedence over the built-in ones.
+    """
+    entry_points = _get_entry_points()
+    if connector_type in entry_points:
+        return entry_points[connector_type].load()
+    if connector_type in BUILTIN_CONNECTORS:
+        module_name, class_name = BUILTIN_CONNECTORS[connector_type].split(':')
+        return getattr(importlib.import_module(module_name), class_name)
+    raise ConnectorNotFoundError('No connector registered for type {}. Available types: {}'.format(connector_type, ', '.join(get_connector_types())))
+
+
+def _run_connector(connection_name: str, connection_config: dict, store_dir: str) -> None:
+    connector_type = connection_config.get('type', connection_name)
+    connector_class = load_connector(connector_type)
+    connector = connector_class(**{key: value for key, value in connection_config.items() if key not in RESERVED_KEYS})
+    connector.connection_name = connection_name
+    definitions = connector.fetch_definitions()
+
+    # write to a temporary file first, so a killed worker never leaves a partial result behind.
+    file_path = os.path.join(store_dir, connection_name + '.yml')
+    with open(file_path + '.tmp', 'w') as file:
+        yaml.dump(definitions, file, sort_keys=False)
+    os.replace(file_path + '.tmp', file_path)
+
+    if getattr(connector, 'column_store', None) is not None:
+        columns_path = os.path.join(store_dir, connection_name + COLUMNS_FILE_SUFFIX)
+        connector.column_store.save(columns_path + '.tmp')
+        os.replace(columns_path + '.tmp', columns_path)
+
+
+def run_connections(connections: dict, store_dir: str) -> Dict[str, str]:
+    """ runs every configured connection concurrently, each in its own worker process.
+    Every worker writes its definitions to `<store_dir>/<connection name>.yml`. A worker
+    that runs longer than the `timeout` (in seconds) of its connection is terminated,
+    without affecting the other connections.
+    Returns:
+        a dict with the status (success, failed or timeout) of every connection.
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+
+    workers = {}
+    status = {}
+    for connection_name, connection_config in connections.items():
+        # resolve the connector up front, so unknown types and incomplete plugins fail here and not in a worker.
+        try:
+            connector_class = load_connector(connection_config.get('type', connection_name))
+            if inspect.isabstract(connector_class):
+                raise TypeError('connector {} does not implement {}'.format(connector_class.__name__, ', '.join(sorted(connector_class.__abstractmethods__))))
+        except (ConnectorNotFoundError, TypeError) as err:
+            logging.error('connection {} can not be started: {}'.format(connection_name, err))
+            status[connection_name] = 'failed'
+            continue
+
+        worker = multiprocessing.Process(target=_run_connector,
+                                         args=(connection_name, connection_config, store_dir),
+                                         name='glow-connector-' + connection_name)
+        worker.start()
+        deadline = time.monotonic() + connection_config.get('timeout', DEFAULT_TIMEOUT)
+        workers[connection_name] = (worker, deadline)
+        logging.info('started fetching connection {}'.format(connection_name))
+
+    for connection_name, (worker, deadline) in workers.items():
+        worker.join(max(0, deadline - time.monotonic()))
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
+            logging.error('connection {} timed out and was stopped.'.format(connection_name))
+            status[connection_name] = 'timeout'
+        elif worker.exitcode != 0:
+            logging.error('connection {} failed with exit code {}.'.format(connection_name, worker.exitcode))
+            status[connection_name] = 'failed'
+        else:
+            logging.info('connection {} fetched.'.format(connection_name))
+            status[connection_name] = 'success'
+    return status
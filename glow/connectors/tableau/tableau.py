@@ -5,14 +5,23 @@ import zipfile
 import xml.etree.ElementTree as ET
 import shutil
 import connectors.tableau.tableau_client as tc
+import connectors.tableau.tableau_async_client as atc
+from connectors.registry import Connector
+import column_store as cs
 import re 
+import asyncio
 from tableauserverclient.server.endpoint import datasources_endpoint
 
 TABLEAU_VERSION = '3.13'
 TEMP_PATH = '/Users/tomevers/projects/airglow/temp'
 TABLEAU_PATH = 'tableau'
 
-class TableauConnector():
+class TableauConnector(Connector):
+    """ fetches the data sources of a Tableau site.
+    Set `use_async` in the connection config to list and download all data sources
+    concurrently with the AsyncTableauClient, `max_concurrency` limits the number of
+    requests in flight.
+    """
     server = None
     sitename = None
     username = None
@@ -23,11 +32,14 @@ class TableauConnector():
     all_tasks = None
     all_schedules = None
 
-    def __init__(self, server, sitename, username, password) -> None:
+    def __init__(self, server, sitename, username, password, use_async=False, max_concurrency=None) -> None:
         self.server = server
         self.sitename = sitename
         self.username = username
         self.password = password
+        self.use_async = use_async
+        self.max_concurrency = max_concurrency
+        self.column_store = cs.ColumnStore()
         self.tableau_auth = TSC.TableauAuth(self.username, self.password, self.sitename)
         self.tableau_server = TSC.Server(self.server)
         self.tableau_server.version = TABLEAU_VERSION
@@ -63,8 +75,19 @@ class TableauConnector():
         file_path = os.path.join(tableau_folder, datasource_name)
         ds_path = self.tableau_server.datasources.download(datasource_id, filepath=file_path, include_extract=False)
 
+        return self._load_tds(ds_path, os.path.join(tableau_folder, datasource_name), datasource_name)
+
+    def _load_tds(self, ds_path, ds_folder, datasource_name):
+        """ parses the .tds file of a downloaded data source and removes the downloaded files.
+        Data sources without an extract are downloaded as a plain .tds file instead of a .tdsx archive.
+        """
+        tree = None
+        if not zipfile.is_zipfile(ds_path):
+            tree = ET.parse(ds_path)
+            os.remove(ds_path)
+            return tree
+
         # unzip data source
-        ds_folder = os.path.join(tableau_folder, datasource_name)
         if not os.path.isdir(ds_folder):
             os.makedirs(ds_folder)
         with zipfile.ZipFile(ds_path, 'r') as zip_ref:
@@ -85,6 +108,35 @@ class TableauConnector():
 
         return tree
 
+    def _remove_download(self, file_path):
+        """ removes the files of a data source download that could not be processed. """
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+        if os.path.isdir(file_path + '_content'):
+            shutil.rmtree(file_path + '_content')
+
+    def _get_week_start(self, tree):
+        for date_option in tree.findall('date-options'):
+            if 'start-of-week' in date_option.attrib.keys():
+                return date_option.attrib['start-of-week']
+        return None
+
+    def _strip_brackets(self, name):
+        # only the outer pair, brackets inside the name are part of it.
+        if name.startswith('[') and name.endswith(']'):
+            return name[1:-1]
+        return name
+
+    def _get_columns(self, tree):
+        """ returns the (name, caption, datatype, role, formula) of every column defined in the data source. """
+        for column in tree.findall('column'):
+            calculation = column.find('calculation')
+            yield (self._strip_brackets(column.attrib.get('name', '')),
+                   column.attrib.get('caption'),
+                   column.attrib.get('datatype'),
+                   column.attrib.get('role'),
+                   calculation.attrib.get('formula') if calculation is not None else None)
+
     def fetch_datasources(self):
         owners = {}
 
@@ -98,6 +150,7 @@ class TableauConnector():
                 clean_datasource = {}
                 clean_datasource['data_source_name'] = datasource.name
                 clean_datasource['data_source_type'] = 'Tableau Data Source'
+                clean_datasource['data_source_connection'] = self.connection_name
                 clean_datasource['data_source_project'] = datasource.project_name
                 clean_datasource['data_source_url'] = datasource.webpage_url
                 clean_datasource['data_source_description'] = datasource.description
@@ -127,14 +180,96 @@ class TableauConnector():
 
                 clean_datasource['raw_relationships_xml'] = self._get_relationships_xml(datasource.id, datasource.name)
                 
-                if clean_datasource['raw_relationships_xml'].findall('date-options'):
-                    for date_option in clean_datasource['raw_relationships_xml'].findall('date-options'):
-                        if 'start-of-week' in date_option.attrib.keys():
-                            clean_datasource['data_source_materialisation']['week_start'] = date_option.attrib['start-of-week']
-                            break
+                week_start = self._get_week_start(clean_datasource['raw_relationships_xml'])
+                if week_start is not None:
+                    clean_datasource['data_source_materialisation']['week_start'] = week_start
+                self.column_store.add_datasource(cs.datasource_key(self.connection_name, datasource.project_name, datasource.name),
+                                                 self._get_columns(clean_datasource['raw_relationships_xml']))
                 datasources.append(clean_datasource)
 
         return datasources
+
+    async def _fetch_datasource_async(self, client, datasource, owners, tableau_folder):
+        clean_datasource = {}
+        clean_datasource['data_source_name'] = datasource['name']
+        clean_datasource['data_source_type'] = 'Tableau Data Source'
+        clean_datasource['data_source_connection'] = self.connection_name
+        clean_datasource['data_source_project'] = datasource['project_name']
+        clean_datasource['data_source_url'] = datasource['webpage_url']
+        clean_datasource['data_source_description'] = datasource['description']
+        clean_datasource['data_source_created_at'] = datasource['created_at']
+        clean_datasource['data_source_updated_at'] = datasource['updated_at']
+        clean_datasource['data_source_owner'] = {
+            'name': owners.get(datasource['owner_id'], '')
+        }
+        clean_datasource['data_source_materialisation'] = {}
+        if datasource['has_extracts']:
+            clean_datasource['data_source_materialisation']['type'] = 'Extract'
+        else:
+            clean_datasource['data_source_materialisation']['type'] = 'Live'
+
+        clean_datasource['data_source_materialisation']['schedules'] = self._get_schedule_for_datasource(datasource['id'])
+
+        # names are not unique across projects, so downloads are stored by id.
+        file_path = os.path.join(tableau_folder, datasource['id'])
+        try:
+            connections, ds_path = await atc.gather(client.get_datasource_connections(datasource['id']),
+                                                    client.download_datasource(datasource['id'], file_path))
+        except Exception:
+            self._remove_download(file_path)
+            raise
+        if len(connections) >= 1:
+            clean_datasource['data_source_materialisation']['db_username'] = connections[0]['username']
+        else:
+            clean_datasource['data_source_materialisation']['db_username'] = ''
+
+        # unzipping and parsing the .tds is blocking, so it runs outside of the event loop.
+        try:
+            clean_datasource['raw_relationships_xml'] = await asyncio.get_running_loop().run_in_executor(
+                None, self._load_tds, ds_path, file_path + '_content', datasource['name'])
+        except Exception:
+            self._remove_download(file_path)
+            raise
+
+        week_start = self._get_week_start(clean_datasource['raw_relationships_xml'])
+        if week_start is not None:
+            clean_datasource['data_source_materialisation']['week_start'] = week_start
+        self.column_store.add_datasource(cs.datasource_key(self.connection_name, datasource['project_name'], datasource['name']),
+                                         self._get_columns(clean_datasource['raw_relationships_xml']))
+        return clean_datasource
+
+    async def fetch_datasources_async(self):
+        """ same as fetch_datasources, but lists and downloads all data sources concurrently
+        over a single event loop using the AsyncTableauClient.
+        """
+        tableau_folder = os.path.join(TEMP_PATH, TABLEAU_PATH)
+        if not os.path.isdir(tableau_folder):
+            os.makedirs(tableau_folder)
+
+        async with atc.AsyncTableauClient(server=self.server,
+                                          sitename=self.sitename,
+                                          username=self.username,
+                                          password=self.password,
+                                          max_concurrency=self.max_concurrency or atc.MAX_CONCURRENCY) as client:
+            all_datasources, users, tasks = await atc.gather(client.get_datasources(),
+                                                             client.get_users(),
+                                                             client.get_tasks())
+            logging.info("{} datasources found.".format(len(all_datasources)))
+            self.all_tasks = tasks
+            owners = {user['id']: user['name'] for user in users}
+
+            # a failed data source is skipped, the others are still fetched before the session is closed.
+            results = await asyncio.gather(*[self._fetch_datasource_async(client, datasource, owners, tableau_folder)
+                                             for datasource in all_datasources],
+                                           return_exceptions=True)
+
+        datasources = []
+        for datasource, result in zip(all_datasources, results):
+            if isinstance(result, BaseException):
+                logging.error('could not fetch Tableau data source {}: {}'.format(datasource['name'], result))
+                continue
+            datasources.append(result)
+        return datasources
     
     def _get_relation_query(self, expression):
         if expression.attrib['op'].lower() == '=':
@@ -249,3 +384,10 @@ class TableauConnector():
         datasource['relations'] = clean_relations
         del datasource['raw_relationships_xml']
         return datasource
+
+    def fetch_definitions(self):
+        if self.use_async:
+            datasources = asyncio.run(self.fetch_datasources_async())
+        else:
+            datasources = self.fetch_datasources()
+        return [self.generate_datasource_dag(datasource) for datasource in datasources]
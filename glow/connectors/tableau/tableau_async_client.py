@@ -0,0 +1,206 @@
+import aiohttp
+import asyncio
+import datetime
+import xml.etree.ElementTree as ET
+import re
+
+from connectors.tableau.tableau_client import TableauException
+
+TABLEAU_VERSION = '3.13'
+PAGE_SIZE = 100
+MAX_CONCURRENCY = 10
+DOWNLOAD_CHUNK_SIZE = 1024 * 64
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+async def gather(*aws):
+    """ like asyncio.gather, but waits for all awaitables before raising the first exception,
+    so no request is left running when the session is closed.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+class AsyncTableauClient():
+    """ asyncio variant of the TableauClient.
+
+    All requests share one aiohttp session and the number of requests in flight
+    is limited by a semaphore, so hundreds of data sources can be fetched over
+    a single event loop. Use it as an async context manager:
+
+        async with AsyncTableauClient(server, sitename, username, password) as client:
+            datasources = await client.get_datasources()
+    """
+
+    token = None
+    site_id = None
+
+    server = None
+    sitename = None
+    username = None
+    password = None
+
+    url = None
+
+    def __init__(self, server, sitename, username, password, max_concurrency=MAX_CONCURRENCY) -> None:
+        self.server = server
+        self.sitename = sitename
+        self.username = username
+        self.password = password
+        self.url = '{server}api/{version}/'.format(server=server, version=TABLEAU_VERSION)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = aiohttp.ClientSession()
+        try:
+            await self.sign_in()
+        except Exception:
+            await self._session.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.sign_out()
+        finally:
+            await self._session.close()
+
+    def _parse_xml(self, text):
+        # quick hack to remove xml namespace
+        xml_text = re.sub(' xmlns="[^"]+"', '', text, count=1)
+        return ET.fromstring(xml_text)
+
+    def _parse_datetime(self, value):
+        """ parses a REST API timestamp into a UTC datetime, like tableauserverclient does. """
+        if value is None:
+            return None
+        return datetime.datetime.strptime(value, DATETIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+
+    def _headers(self):
+        return {'X-Tableau-Auth': self.token}
+
+    async def sign_in(self):
+        data = """
+        <tsRequest>
+	        <credentials name="{username}" password="{password}">
+		        <site contentUrl="{sitename}" />
+	        </credentials>
+        </tsRequest>
+        """.format(username=self.username, password=self.password, sitename=self.sitename)
+
+        async with self._semaphore:
+            async with self._session.post('{url}/auth/signin'.format(url=self.url), data=data) as r:
+                if r.status != 200:
+                    raise TableauException('Could not authenticate')
+                root = self._parse_xml(await r.text())
+
+        self.token = root[0].attrib['token']
+        self.site_id = root[0][0].attrib['id']
+
+    async def sign_out(self):
+        if self.token is None:
+            return
+        async with self._semaphore:
+            async with self._session.post('{url}/auth/signout'.format(url=self.url), headers=self._headers()):
+                pass
+        self.token = None
+        self.site_id = None
+
+    async def _get_xml(self, url, params=None):
+        async with self._semaphore:
+            async with self._session.get(url, headers=self._headers(), params=params) as r:
+                if r.status != 200:
+                    raise TableauException('Request to {} failed with status {}'.format(url, r.status))
+                return self._parse_xml(await r.text())
+
+    async def _get_paginated(self, url, tag):
+        """ returns all elements with the given tag from a paginated endpoint.
+        The first page is requested on its own to learn the total number of items,
+        the remaining pages are requested concurrently.
+        """
+        first_page = await self._get_xml(url, params={'pageSize': PAGE_SIZE, 'pageNumber': 1})
+        pagination = first_page.find('pagination')
+        total_available = int(pagination.attrib['totalAvailable']) if pagination is not None else 0
+        page_count = -(-total_available // PAGE_SIZE)
+
+        pages = [first_page]
+        pages += await gather(*[self._get_xml(url, params={'pageSize': PAGE_SIZE, 'pageNumber': page_number})
+                                for page_number in range(2, page_count + 1)])
+        return [element for page in pages for element in page.iter(tag)]
+
+    async def get_datasources(self):
+        url = '{url}/sites/{site}/datasources'.format(url=self.url, site=self.site_id)
+        datasources = []
+        for element in await self._get_paginated(url, 'datasource'):
+            project = element.find('project')
+            owner = element.find('owner')
+            datasources.append({
+                'id': element.attrib['id'],
+                'name': element.attrib['name'],
+                'project_name': project.attrib['name'] if project is not None else '',
+                'webpage_url': element.attrib.get('webpageUrl', ''),
+                'description': element.attrib.get('description', ''),
+                'created_at': self._parse_datetime(element.attrib.get('createdAt')),
+                'updated_at': self._parse_datetime(element.attrib.get('updatedAt')),
+                'has_extracts': element.attrib.get('hasExtracts', 'false').lower() == 'true',
+                'owner_id': owner.attrib['id'] if owner is not None else None
+            })
+        return datasources
+
+    async def get_users(self):
+        url = '{url}/sites/{site}/users'.format(url=self.url, site=self.site_id)
+        return [{'id': element.attrib['id'], 'name': element.attrib['name']}
+                for element in await self._get_paginated(url, 'user')]
+
+    async def get_tasks(self):
+        url = '{url}/sites/{site}/tasks/extractRefreshes'.format(url=self.url, site=self.site_id)
+        tasks = []
+        for task in await self._get_paginated(url, 'task'):
+            new_task = {}
+            if task[0].tag == 'extractRefresh':
+                new_task['id'] = task[0].attrib['id']
+                new_task['type'] = task[0].attrib['type']
+                if task[0][0].tag == 'schedule':
+                    new_task['schedule_id'] = task[0][0].attrib['id']
+                    new_task['frequency'] = task[0][0].attrib['frequency']
+                    new_task['state'] = task[0][0].attrib['state']
+                    new_task['next_run_at'] = task[0][0].attrib['nextRunAt']
+                new_task['target_type'] = task[0][1].tag
+                new_task['target_id'] = task[0][1].attrib['id']
+            tasks.append(new_task)
+        return tasks
+
+    async def get_datasource_connections(self, datasource_id):
+        url = '{url}/sites/{site}/datasources/{id}/connections'.format(url=self.url, site=self.site_id, id=datasource_id)
+        root = await self._get_xml(url)
+        return [{'id': element.attrib['id'],
+                 'type': element.attrib.get('type', ''),
+                 'username': element.attrib.get('userName', '')}
+                for element in root.iter('connection')]
+
+    async def download_datasource(self, datasource_id, file_path, include_extract=False):
+        """ streams the content of a data source into file_path.
+        Returns:
+            the path of the downloaded file.
+        """
+        url = '{url}/sites/{site}/datasources/{id}/content'.format(url=self.url, site=self.site_id, id=datasource_id)
+        params = {'includeExtract': str(include_extract).lower()}
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            async with self._session.get(url, headers=self._headers(), params=params) as r:
+                if r.status != 200:
+                    raise TableauException('Could not download data source {}'.format(datasource_id))
+                # file writes run in the default executor to keep the event loop free for other requests.
+                file = await loop.run_in_executor(None, open, file_path, 'wb')
+                try:
+                    async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await loop.run_in_executor(None, file.write, chunk)
+                finally:
+                    await loop.run_in_executor(None, file.close)
+        return file_path
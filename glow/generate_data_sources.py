@@ -1,11 +1,12 @@
-from connectors.tableau.tableau import TableauConnector
 from posixpath import join
 from typing import List, Dict, Tuple
 
 import argparse
-import connectors.tableau
+import connectors.registry as registry
 import os 
 import utils
+import search_index
+import column_store as cs
 import logging
 import sys
 import yaml
@@ -15,7 +16,8 @@ logging.basicConfig(level=logging.INFO)
 MAIN_PATH = '/Users/tomevers/projects/airglow'
 CONNECTIONS_CONF_FILE = 'airglow_connections.yml'
 
-DS_FILENAME = 'data sources.yml'
+DS_DIR = 'definitions/data sources'
+LEGACY_DS_FILE = 'definitions/data sources.yml'
 DS_TEMPLATE = 'templates/data_source.md'
 
 
@@ -40,68 +42,130 @@ def store_ds(events_md: str, event: dict, docs_dir: str):
         file.write(events_md)
 
 
-def generate_datasources_yaml():
+def get_connections() -> dict:
     conn_config = get_connections_config()
     if 'connections' not in conn_config.keys():
         logging.exception('connections info not found in airglow_connections config file.')
         sys.exit(1)
-    tableau_config = conn_config['connections']['tableau']
-    tableau_connector = TableauConnector(server=tableau_config['server'], 
-                                        sitename=tableau_config['sitename'], 
-                                        password=tableau_config['password'],
-                                        username=tableau_config['username'])
-    ds = tableau_connector.fetch_datasources()
-    ds = [tableau_connector.generate_datasource_dag(datasource) for datasource in ds]  
-
-    logging.info("storing data source")
-    
-    with open(r'/Users/tomevers/projects/airglow/definitions/data sources.yml', 'w') as file:
-        documents = yaml.dump(ds, file, sort_keys=False)
+    return conn_config['connections']
+
 
+def generate_datasources_yaml():
+    """ fetches the definitions of every configured connection concurrently.
+    Each connection is stored in its own yaml file in the data sources definitions folder.
+    Returns:
+        a list with the data sources of all connections that were fetched successfully.
+    """
+    store_dir = os.path.join(MAIN_PATH, DS_DIR)
+    status = registry.run_connections(get_connections(), store_dir)
+
+    ds = []
+    for connection_name, connection_status in status.items():
+        file_path = os.path.join(store_dir, connection_name + '.yml')
+        if connection_status != 'success':
+            # workers replace their file atomically, so it still holds the last successful fetch.
+            if not os.path.isfile(file_path):
+                logging.warning('skipping data sources of connection {} ({}), no previous definitions found.'.format(connection_name, connection_status))
+                continue
+            logging.warning('using the previous data sources of connection {} ({})'.format(connection_name, connection_status))
+        ds += utils.get_file(file_path, yaml_format=True) or []
     return ds
 
 
-def generate_markdown(datasource):
+def get_datasource_columns(connection_names: List[str]) -> cs.ColumnStore:
+    """ returns the column metadata of the data sources of the given connections. """
+    columns = cs.ColumnStore()
+    for connection_name in connection_names:
+        file_path = os.path.join(MAIN_PATH, DS_DIR, connection_name + cs.COLUMNS_FILE_SUFFIX)
+        if os.path.isfile(file_path):
+            columns.load(file_path)
+    return columns
+
+
+def _get_datasource_key(datasource: dict) -> str:
+    return cs.datasource_key(datasource.get('data_source_connection'), datasource['data_source_project'], datasource['data_source_name'])
+
+
+def generate_markdown(datasource, columns: cs.ColumnStore = None):
     template_path = os.path.join(MAIN_PATH, DS_TEMPLATE)
     with open(template_path, 'r') as file:
         ds_md = file.read()
-    ds_md = ds_md.replace('{<yaml_header>}', yaml.dump(datasource))
+    ds_data = dict(datasource)
+    if columns is not None:
+        ds_data['data_source_columns'] = columns.get_columns(_get_datasource_key(datasource))
+    ds_md = ds_md.replace('{<yaml_header>}', yaml.dump(ds_data))
     
     return ds_md
 
 
-def get_datasource_definitions(yaml_format=True) -> dict:
-    """ returns the data source definition yaml file as a dict.
+def index_datasource(index: search_index.SearchIndex, datasource: dict, columns: cs.ColumnStore) -> None:
+    texts = [datasource['data_source_name'], datasource['data_source_description'] or '']
+    for relation in datasource.get('relations', []):
+        texts += [relation.get('name', ''), relation.get('model', ''), relation.get('to', '')]
+    for column in columns.get_columns(_get_datasource_key(datasource)):
+        texts += [column['name'], column.get('caption', '')]
+    index.update_document(key=os.path.join('data sources', datasource['data_source_project'], datasource['data_source_name']),
+                          doc_type='data source',
+                          title=datasource['data_source_name'],
+                          url='data sources/{}/{}.html'.format(datasource['data_source_project'], datasource['data_source_name']),
+                          texts=texts)
+
+
+def get_datasource_definitions(connection_names: List[str], yaml_format=True) -> list:
+    """ returns the data source definitions of the given connections stored in the data sources folder.
+    Files of connections that are no longer configured are ignored.
     Returns:
-        a dict with all data sources defined in the yaml file.
+        a list with all data sources defined in the yaml files.
     """
-    yaml_file = os.path.join(MAIN_PATH, 'definitions', DS_FILENAME)
-    try:
-        return utils.get_file(yaml_file, yaml_format)
-    except FileNotFoundError:
-        logging.exception(FileNotFoundError('Datasource definition file can not be found.'))
+    ds_dir = os.path.join(MAIN_PATH, DS_DIR)
+    if not os.path.isdir(ds_dir):
+        legacy_file = os.path.join(MAIN_PATH, LEGACY_DS_FILE)
+        if os.path.isfile(legacy_file):
+            logging.warning('Datasource definition folder not found, using {}.'.format(legacy_file))
+            return utils.get_file(legacy_file, yaml_format) or []
+        logging.exception(FileNotFoundError('Datasource definition folder can not be found.'))
         sys.exit(1)
 
+    datasources = []
+    for connection_name in connection_names:
+        file_path = os.path.join(ds_dir, connection_name + '.yml')
+        if not os.path.isfile(file_path):
+            logging.warning('no local data sources found for connection {}.'.format(connection_name))
+            continue
+        datasources += utils.get_file(file_path, yaml_format) or []
+    return datasources
+
 
 def main(args):
     logging.info('Starting datasource generation script..')
     logging.info('****************************************')
     logging.info('** Step 1: Get all information')
     logging.info('****************************************')
+    connection_names = list(get_connections().keys())
     if args.use_local_definitions.lower() in ('true', '1', 't'):
         logging.info('** Retrieving data source definitions from local yaml file')
-        datasource_defs = get_datasource_definitions()
+        datasource_defs = get_datasource_definitions(connection_names)
     else:
-        logging.info('** Retrieving data source definitions from Tableau')
+        logging.info('** Retrieving data source definitions from all connections')
         datasource_defs = generate_datasources_yaml()
+    columns = get_datasource_columns(connection_names)
+    logging.info('** {} columns loaded for {} data sources'.format(len(columns), len(columns.datasources)))
     
     logging.info('****************************************')
     logging.info('** Step 2: Generate and store event files.')
     logging.info('****************************************')
+    index = search_index.SearchIndex(args.docs_dir)
     for datasource in datasource_defs:
         logging.info('generating datasource md file for {}'.format(datasource['data_source_name']))
-        ds_md = generate_markdown(datasource)
+        ds_md = generate_markdown(datasource, columns)
         utils.store_md(ds_md, 'data sources', datasource['data_source_project'], datasource['data_source_name'],  args.docs_dir)
+        index_datasource(index, datasource, columns)
+
+    logging.info('****************************************')
+    logging.info('** Step 3: Update search index.')
+    logging.info('****************************************')
+    index.remove_missing('data source')
+    index.save()
 
 
 if __name__ == "__main__":
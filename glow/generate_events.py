@@ -1,18 +1,22 @@
 from posixpath import join
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator
 import logging
 import argparse
 import os
 import shutil
+import tempfile
 import json
 import yaml
 import sys 
 import git
 import subprocess
+import concurrent.futures
+import datetime
 import SnowflakeQuery as sql
 import pandas as pd
 import UsageChartGenerator
 import utils
+import search_index
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,8 +25,14 @@ AMP_BASE_URL = 'https://amplitude.com/api/2/taxonomy/'
 ED_FILENAME = 'event_definitions.yml'
 MD_FILENAME = 'model_definitions.yml'
 EVENT_TEMPLATE = 'templates/event.md'
+MODEL_TEMPLATE = 'templates/model.md'
 EVENT_DEFINITIONS_GIT = 'https://github.com/airtasker/airtasker_event_definitions.git'
 EVENT_DEFINITIONS_GIT_FOLDER = 'event_definitions_git_clone'
+USAGE_DIR = 'usage'
+USAGE_WEEK_FORMAT = '%d/%m/%Y'
+
+USAGE_BATCH_SIZE = 500
+HISTORY_WORKERS = 8
 
 ENABLE_SQL_QUERIES = os.getenv("ENABLE_SQL_QUERIES", 'True').lower() in ('true', '1', 't')
 
@@ -40,6 +50,55 @@ def get_event_definitions(yaml_format=True) -> dict:
         sys.exit(1)
 
 
+def iter_event_definitions() -> Iterator[Tuple[str, dict, int, int]]:
+    """ reads the event definition yaml file one top level event at a time.
+    Only the event that is currently yielded is kept in memory.
+    Returns:
+        an iterator of (event key, event, first line, number of lines) tuples. The line
+        range is 1-based and can be used to look up the history of the event in git.
+    """
+    yaml_file = os.path.join(EVENT_DEFINITIONS_GIT_FOLDER, ED_FILENAME)
+    if not os.path.isfile(yaml_file):
+        logging.exception(FileNotFoundError('Event definition file can not be found.'))
+        sys.exit(1)
+
+    with open(yaml_file, 'r') as file:
+        yield from _iter_yaml_mapping(file)
+
+
+def _iter_yaml_mapping(stream) -> Iterator[Tuple[str, dict, int, int]]:
+    loader = yaml.SafeLoader(stream)
+    try:
+        loader.get_event() # StreamStartEvent
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event() # DocumentStartEvent
+        if not loader.check_event(yaml.MappingStartEvent):
+            # an empty document (or one with only `---`) is a null scalar.
+            if loader.construct_object(loader.compose_node(None, None)) is None:
+                return
+            logging.error('Event definition file should contain a mapping of events.')
+            sys.exit(1)
+        loader.get_event() # MappingStartEvent
+        while not loader.check_event(yaml.MappingEndEvent):
+            key_node = loader.compose_node(None, None)
+            value_node = loader.compose_node(None, None)
+            event_key = loader.construct_object(key_node, deep=True)
+            event = loader.construct_object(value_node, deep=True)
+            # drop the constructed objects, the loader would keep them until the end of the document.
+            loader.constructed_objects = {}
+            loader.recursive_objects = {}
+            # the event ends where the next key or the end of the mapping starts. An alias node keeps
+            # the marks of its anchor, so the marks of the value node can not be used for this.
+            end_mark = loader.peek_event().start_mark
+            end_line = end_mark.line + 1 if end_mark.column > 0 else end_mark.line
+            start = key_node.start_mark.line + 1
+            length = end_line - key_node.start_mark.line
+            yield event_key, event, start, length
+    finally:
+        loader.dispose()
+
+
 def get_model_definitions(yaml_format=True) -> dict:
     """ returns the model definition yaml file as a dict.
     Returns:
@@ -68,12 +127,35 @@ def clean_model_definitions(models: dict) -> dict:
         cleaned_models[model_name] = cleaned_model
     return cleaned_models
 
-def _get_model_properties(event: dict, model_defs: dict) -> dict:
+def build_model_index(models: dict) -> dict:
+    """ returns a lookup of model name to the reference used in the event files.
+    Events link to the model page instead of inlining the model properties.
+    """
+    return {model_name: {'name': model_name, 'link': '../../models/{}.md'.format(model_name)} for model_name in models.keys()}
+
+
+def generate_model_markdown(model_name: str, model: List) -> str:
+    model_md = utils.get_template(MAIN_PATH, MODEL_TEMPLATE)
+
+    model_data = {}
+    model_data['model_name'] = model_name
+    model_data['model_properties'] = model
+    return model_md.replace('{<yaml_header>}', yaml.dump(model_data))
+
+
+def _get_model_links(event: dict, model_index: dict) -> List:
     if 'models' not in event.keys():
-        return {}
-    
-    return {model_name: model for (model_name, model) in model_defs.items() if model_name in event['models'] }
+        return []
     
+    return [model_index[model_name] for model_name in event['models'] if model_name in model_index]
+
+
+def _get_model_properties(event: dict, models: dict) -> dict:
+    if 'models' not in event.keys():
+        return {}
+
+    return {model_name: models[model_name] for model_name in event['models'] if model_name in models}
+
 
 def _get_platforms(event: dict) -> str:
     if 'platforms' not in event.keys():
@@ -119,6 +201,14 @@ def _get_last_modified_info(event_key: str, event_file: List) -> str:
         logging.warning("Invalid log range for keyword {event_key}. start: {start}, length: {length}, length of file: {file_length}".format(event_key=event_key, start=start, length=length, file_length=len(event_file)))
         return '', '', '' # TODO: fix last line on event file.
 
+    return _get_last_modified_info_for_lines(start, length)
+
+
+def _get_last_modified_info_for_lines(start: int, length: int) -> str:
+    if start == 0 or length <= 0:
+        logging.warning("Invalid log range. start: {start}, length: {length}".format(start=start, length=length))
+        return '', '', ''
+
     ps = subprocess.Popen(("git",
                                 "--git-dir",
                                 os.path.join(EVENT_DEFINITIONS_GIT_FOLDER ,".git"),
@@ -128,46 +218,129 @@ def _get_last_modified_info(event_key: str, event_file: List) -> str:
                                 , stdout=subprocess.PIPE)
     output = subprocess.check_output(('head', '-n', '1'), stdin=ps.stdout)
     ps.wait()
+    if not output:
+        logging.warning("No history found for lines {start} to {end}.".format(start=start, end=start+length-1))
+        return '', '', ''
     last_modified_date, last_modified_author, last_modified_hash = output.decode('UTF-8')[:-1].split('|') # remove '\n' 
     return last_modified_date, last_modified_author, last_modified_hash
 
 
-def _get_usage_chart(usage_data: pd.DataFrame, event_name: str) -> str:
-    chart = UsageChartGenerator.UsageChartGenerator(event_name)
-    weeks = [ week.strftime("%d/%m/%Y") for week in usage_data['WEEK'].tolist()]
-    totals = [total if total is not None else 0 for total in usage_data[event_name].tolist()]
-    chart.add_data(x_series=weeks, y_series=totals)
-    return chart.generate_chart()
+def _get_usage_chart(event: dict) -> str:
+    chart = UsageChartGenerator.UsageChartGenerator(event['name'])
+    return chart.generate_lazy_chart('../../{}/{}.json'.format(USAGE_DIR, event['category']))
+
+
+def build_usage_data(usage_data: pd.DataFrame, events: List[dict]) -> Dict[str, dict]:
+    """ converts the usage query results into the usage data files of the docs.
+    Returns:
+        a dict with per event category the week labels and the weekly totals of every event.
+    """
+    weeks = [week.strftime(USAGE_WEEK_FORMAT) for week in usage_data['WEEK'].tolist()]
+    usage_by_category = {}
+    for event in events:
+        category_usage = usage_by_category.setdefault(event['category'], {'weeks': weeks, 'events': {}})
+        totals = usage_data[event['name']].tolist() if event['name'] in usage_data.columns else []
+        category_usage['events'][event['name']] = [int(total) if pd.notna(total) else 0 for total in totals]
+    return usage_by_category
+
+
+def store_usage_data(category: str, category_usage: dict, docs_dir: str) -> None:
+    """ writes the usage data file of an event category. The file is written to a temporary
+    file first and only replaces the existing file when its content changes.
+    """
+    file_dir = os.path.join(docs_dir, USAGE_DIR)
+    file_path = os.path.join(file_dir, category + '.json')
+    if not os.path.isdir(file_dir):
+        os.makedirs(file_dir)
+
+    new = json.dumps(category_usage, separators=(',', ':'), sort_keys=True)
+    if os.path.isfile(file_path):
+        with open(file_path, 'r') as file:
+            if file.read() == new:
+                return
+    with open(file_path + '.tmp', 'w') as file:
+        file.write(new)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def stage_usage_data(category: str, category_usage: dict, staging_dir: str) -> None:
+    """ appends the usage of a batch of events to the staging file of its category.
+    The staged batches are combined into the usage data file by store_staged_usage_data.
+    """
+    with open(os.path.join(staging_dir, category + '.jsonl'), 'a') as file:
+        file.write(json.dumps(category_usage, separators=(',', ':')) + '\n')
+
+
+def _merge_usage_data(batches: List[dict]) -> dict:
+    """ merges the usage of several batches into one usage data file. The query of a batch only
+    returns the weeks in which its events occurred, so every series is aligned to all weeks.
+    """
+    weeks = sorted(set(week for batch_usage in batches for week in batch_usage['weeks']),
+                   key=lambda week: datetime.datetime.strptime(week, USAGE_WEEK_FORMAT))
+    events = {}
+    for batch_usage in batches:
+        for event_name, totals in batch_usage['events'].items():
+            totals_by_week = dict(zip(batch_usage['weeks'], totals))
+            events[event_name] = [totals_by_week.get(week, 0) for week in weeks]
+    return {'weeks': weeks, 'events': events}
+
+
+def store_staged_usage_data(staging_dir: str, docs_dir: str, skip_categories: set) -> None:
+    """ combines the staged batches of every category and stores them once. Categories in
+    skip_categories have incomplete usage data, their files of the previous run are kept.
+    """
+    for file_name in sorted(os.listdir(staging_dir)):
+        category = file_name[:-len('.jsonl')]
+        if category in skip_categories:
+            logging.warning('usage data of category {} is incomplete and is not updated.'.format(category))
+            continue
+        with open(os.path.join(staging_dir, file_name), 'r') as file:
+            category_usage = _merge_usage_data([json.loads(line) for line in file])
+        store_usage_data(category, category_usage, docs_dir)
+
+
+def get_event_history(event_key: str, repo: git.Reference.repo, event_file: List = None, event_lines: Tuple[int, int] = None) -> Dict:
+    """ returns the creation and last modification info of an event from git.
+    The lines of the event are looked up in event_file, unless they are given as event_lines.
+    """
+    history = {}
+    creation_date, event_creation_author, event_creation_hash = _get_created_info(event_key, repo)
+    event_creation_link = 'https://github.com/airtasker/airtasker_event_definitions/commit/' + event_creation_hash
+    history['event_creation_date'] = creation_date
+    history['event_creation_author'] = event_creation_author
+    history['event_creation_link'] = event_creation_link
+
+    if event_lines is not None:
+        last_modified_date, last_modified_author, last_modified_hash = _get_last_modified_info_for_lines(*event_lines)
+    else:
+        last_modified_date, last_modified_author, last_modified_hash = _get_last_modified_info(event_key, event_file)
+    last_modified_link = 'https://github.com/airtasker/airtasker_event_definitions/commit/' + last_modified_hash
+    history['last_modified_date'] = last_modified_date
+    history['last_modified_author'] = last_modified_author
+    history['last_modified_link'] = last_modified_link
+    return history
 
 
-def generate_markdown(event_key: str, event: dict, repo: git.Reference.repo, event_file: List, model_defs: dict, usage_data: pd.DataFrame ) -> Dict:
+def generate_markdown(event_key: str, event: dict, history: dict, model_index: dict, models: dict) -> Dict:
     template_path = os.path.join(MAIN_PATH, EVENT_TEMPLATE)
     with open(template_path, 'r') as file:
         event_md = file.read()
     
     event_data = {}
     event_data['event_name'] = event['name']
-
-    creation_date, event_creation_author, event_creation_hash = _get_created_info(event_key, repo)
-    event_creation_link = 'https://github.com/airtasker/airtasker_event_definitions/commit/' + event_creation_hash
-    event_data['event_creation_date'] = creation_date
-    event_data['event_creation_author'] = event_creation_author
-    event_data['event_creation_link'] = event_creation_link
-
-    last_modified_date, last_modified_author, last_modified_hash = _get_last_modified_info(event_key, event_file)
-    last_modified_link = 'https://github.com/airtasker/airtasker_event_definitions/commit/' + last_modified_hash
-    event_data['last_modified_date'] = last_modified_date
-    event_data['last_modified_author'] = last_modified_author
-    event_data['last_modified_link'] = last_modified_link
+    event_data.update(history)
 
     event_data['event_description'] = event['description']
     event_data['event_id'] = event_key
     event_data['event_category'] = event['category']
     event_data['event_platforms'] = _get_platforms(event)
     event_data['event_additional_parameters'] = event['event_specific_parameters'] if 'event_specific_parameters' in event.keys() else []
-    event_data['model_properties'] = _get_model_properties(event, model_defs) 
+    event_data['models'] = _get_model_links(event, model_index)
+    # event templates written before the model pages existed still render the inlined properties.
+    if 'model_properties' in event_md:
+        event_data['model_properties'] = _get_model_properties(event, models)
     if ENABLE_SQL_QUERIES:
-        event_md = event_md.replace('{<UsageChart>}', _get_usage_chart(usage_data, event['name']))
+        event_md = event_md.replace('{<UsageChart>}', _get_usage_chart(event))
     else:
         event_md = event_md.replace('{<UsageChart>}', '')
     event_md = event_md.replace('{<yaml_header>}', yaml.dump(event_data))
@@ -175,8 +348,7 @@ def generate_markdown(event_key: str, event: dict, repo: git.Reference.repo, eve
     return event_md
 
 
-def fetch_usage_data(event_defs):
-    event_names = [event['name'] for _, event in event_defs.items()]
+def _get_usage_query(event_names: List) -> str:
     event_names_str = ', '.join(["'{}'".format(event_name) for event_name in event_names])
     
     query = """ with staging as (
@@ -194,18 +366,74 @@ def fetch_usage_data(event_defs):
       as p
       order by week
     """
+    return query
+
 
-    usage_data = sql.SnowflakeQuery().fetch_query(query)
+def _rename_usage_columns(usage_data: pd.DataFrame, event_names: List) -> pd.DataFrame:
+    if usage_data is None:
+        return None
     columns = {"'{}'".format(event_name): event_name for event_name in event_names}
-    usage_data = usage_data.rename(columns, axis=1)
-    return usage_data
+    return usage_data.rename(columns, axis=1)
+
+
+def submit_usage_query(event_defs) -> Tuple[sql.SnowflakeQuery, str, List]:
+    """ starts the usage query on Snowflake and returns without waiting for the results.
+    Pass the result to collect_usage_data to wait for and load the usage data.
+    """
+    event_names = [event['name'] for _, event in event_defs.items()]
+    snowflake_query = sql.SnowflakeQuery()
+    return snowflake_query, snowflake_query.submit_query(_get_usage_query(event_names)), event_names
+
+
+def collect_usage_data(usage_query: Tuple[sql.SnowflakeQuery, str, List]) -> pd.DataFrame:
+    snowflake_query, query_id, event_names = usage_query
+    usage_data = snowflake_query.fetch_query_results(query_id)
+    return _rename_usage_columns(usage_data, event_names)
+
+
+def index_event(index: search_index.SearchIndex, event: dict, model_defs: dict) -> None:
+    texts = [event['name'], event['description']]
+    texts += search_index.flatten_text(event.get('event_specific_parameters'))
+    for model_name in event.get('models', []):
+        texts.append(model_name)
+        texts += [prop['parameter_name'] for prop in model_defs.get(model_name, [])]
+    index.update_document(key=os.path.join('events', event['category'], event['name']),
+                          doc_type='event',
+                          title=event['name'],
+                          url='events/{}/{}.html'.format(event['category'], event['name']),
+                          texts=texts)
+
+
+def index_model(index: search_index.SearchIndex, model_name: str, model: List) -> None:
+    texts = [model_name]
+    texts += [prop['parameter_name'] for prop in model]
+    texts += [prop['description'] for prop in model]
+    index.update_document(key=os.path.join('models', model_name),
+                          doc_type='model',
+                          title=model_name,
+                          url='models/{}.html'.format(model_name),
+                          texts=texts)
+
+
+def store_models(models: dict, index: search_index.SearchIndex, docs_dir: str) -> None:
+    for model_name, model in models.items():
+        logging.info('generating model file for {}'.format(model_name))
+        utils.store_md(generate_model_markdown(model_name, model), 'models', '', model_name, docs_dir)
+        index_model(index, model_name, model)
+
 
 def store_md(events_md: str, event: dict, docs_dir: str):
     file_dir = os.path.join(docs_dir, 'events', event['category'])
     file_name = event['name'] + '.md'
     if not os.path.isdir(file_dir):
         os.makedirs(file_dir)
-    with open(os.path.join(file_dir, file_name), 'w') as file:
+    file_path = os.path.join(file_dir, file_name)
+    # leave unchanged pages untouched, so a refresh only rewrites the events that changed.
+    if os.path.isfile(file_path):
+        with open(file_path, 'r') as file:
+            if file.read() == events_md:
+                return
+    with open(file_path, 'w') as file:
         file.write(events_md)
 
 
@@ -226,32 +454,139 @@ def main(arg):
     logging.info('[1/4] event_defintions_repo loaded.')
     logging.info('[2/4] Get event_defintions file.')
     event_defs = get_event_definitions()
-    logging.info('[3/4] Get model_defintions file.')
+    event_file = get_event_definitions(yaml_format=False)
+    logging.info('[3/4] Submit usage query...')
+    # the usage query only needs the event names, it runs on Snowflake while the
+    # models are rendered and the event history is extracted from git.
+    usage_query = None
+    if ENABLE_SQL_QUERIES:
+        usage_query = submit_usage_query(event_defs)
+    logging.info('[4/4] Get model_defintions file.')
     model_defs = get_model_definitions()
     models = clean_model_definitions(model_defs)
-    logging.info('[4/4] Fetch usage information...')
-    usage_date = None
+    model_index = build_model_index(models)
+
+    logging.info('****************************************')
+    logging.info('** Step 2: Generate and store model and event files.')
+    logging.info('****************************************')
+    index = search_index.SearchIndex(arg.docs_dir)
+    store_models(models, index, arg.docs_dir)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HISTORY_WORKERS) as executor:
+        futures = {executor.submit(get_event_history, event_key, repo, event_file=event_file): event_key for event_key in event_defs.keys()}
+        for future in concurrent.futures.as_completed(futures):
+            event_key = futures[future]
+            event = event_defs[event_key]
+            logging.info('generating event file for {}'.format(event_key))
+            event_md = generate_markdown(event_key, event, future.result(), model_index, models)
+            store_md(event_md, event, arg.docs_dir)
+            index_event(index, event, models)
+
     if ENABLE_SQL_QUERIES:
-        usage_date = fetch_usage_data(event_defs)
-    logging.info('[4/4] usage information loaded!')
-    event_file = get_event_definitions(yaml_format=False)
+        logging.info('waiting for usage information...')
+        usage_data = collect_usage_data(usage_query)
+        if usage_data is None:
+            logging.error('no usage information loaded, the usage data files are not updated.')
+        else:
+            logging.info('usage information loaded!')
+            for category, category_usage in build_usage_data(usage_data, list(event_defs.values())).items():
+                store_usage_data(category, category_usage, arg.docs_dir)
+
+    logging.info('****************************************')
+    logging.info('** Step 3: Update search index.')
+    logging.info('****************************************')
+    index.remove_missing('model')
+    index.remove_missing('event')
+    index.save()
+
+
+def _batches(iterable, batch_size: int) -> Iterator[List]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main_streaming(arg):
+    """ same as main, but reads, renders and stores the events in batches of
+    USAGE_BATCH_SIZE events instead of loading all definitions and usage data upfront.
+    Peak memory is bounded by the batch size instead of the number of events.
+    """
+    logging.info('Starting event generation script in streaming mode..')
+    logging.info('****************************************')
+    logging.info('** Step 1: Get repository and models')
+    logging.info('****************************************')
+    repo = clone_ed_repo()
+    models = clean_model_definitions(get_model_definitions())
+    model_index = build_model_index(models)
+
+    index = search_index.SearchIndex(arg.docs_dir)
+    store_models(models, index, arg.docs_dir)
 
     logging.info('****************************************')
-    logging.info('** Step 2: Generate and store event files.')
+    logging.info('** Step 2: Stream, generate and store event files.')
     logging.info('****************************************')
-    for event_key, event in event_defs.items():
-        logging.info('generating event file for {}'.format(event_key))
-        event_data = None
-        if ENABLE_SQL_QUERIES:
-            event_data = usage_date[['WEEK', event['name']]]
-        event_md = generate_markdown(event_key, event, repo, event_file, models, event_data)
-        store_md(event_md, event, arg.docs_dir)
+    # usage is staged per category and stored once at the end, so a category spread over
+    # several batches is not rewritten per batch and never holds partial data.
+    usage_staging_dir = tempfile.mkdtemp(prefix='glow_usage_')
+    incomplete_categories = set()
+    batches = _batches(iter_event_definitions(), USAGE_BATCH_SIZE)
+    batch = next(batches, None)
+    usage_query = None
+    if ENABLE_SQL_QUERIES and batch is not None:
+        usage_query = submit_usage_query({event_key: event for event_key, event, _, _ in batch})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HISTORY_WORKERS) as executor:
+        while batch is not None:
+            # the usage query of the next batch runs on Snowflake while this batch is rendered.
+            next_batch = next(batches, None)
+            next_usage_query = None
+            if ENABLE_SQL_QUERIES and next_batch is not None:
+                next_usage_query = submit_usage_query({event_key: event for event_key, event, _, _ in next_batch})
+
+            futures = {executor.submit(get_event_history, event_key, repo, event_lines=(start, length)): (event_key, event)
+                       for event_key, event, start, length in batch}
+            for future in concurrent.futures.as_completed(futures):
+                event_key, event = futures[future]
+                logging.info('generating event file for {}'.format(event_key))
+                event_md = generate_markdown(event_key, event, future.result(), model_index, models)
+                store_md(event_md, event, arg.docs_dir)
+                index_event(index, event, models)
+
+            if ENABLE_SQL_QUERIES:
+                usage_data = collect_usage_data(usage_query)
+                if usage_data is None:
+                    logging.error('no usage information loaded for this batch, its usage data is not updated.')
+                    incomplete_categories.update(event['category'] for _, event, _, _ in batch)
+                else:
+                    for category, category_usage in build_usage_data(usage_data, [event for _, event, _, _ in batch]).items():
+                        stage_usage_data(category, category_usage, usage_staging_dir)
+            index.flush()
+            batch, usage_query = next_batch, next_usage_query
+
+    store_staged_usage_data(usage_staging_dir, arg.docs_dir, incomplete_categories)
+    shutil.rmtree(usage_staging_dir)
+
+    logging.info('****************************************')
+    logging.info('** Step 3: Update search index.')
+    logging.info('****************************************')
+    index.remove_missing('model')
+    index.remove_missing('event')
+    index.save()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser('Script to convert event definitions file into markdown format.')
     parser.add_argument('--docs_dir', type=str,
                         help='path to the folder where the generated docs should be stored. The script will need write access to this folder. Defaults to "./docs/"')
+    parser.add_argument('--streaming', action='store_true',
+                        help='read, render and store the events in batches to keep memory use bounded on large definition files.')
     args = parser.parse_args()
-    main(args)
+    if args.streaming:
+        main_streaming(args)
+    else:
+        main(args)
 
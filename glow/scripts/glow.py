@@ -1,4 +1,9 @@
 import click
+import os
+import sys
+
+# the glow modules import each other as top level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 @click.group()
 def cli():
@@ -9,7 +14,10 @@ def cli():
 def fetch():
     """Fetch your definitions and store them into YML files.
     The final result will be available in your $(definitions-path) folder as defined in the glow_project.yml file."""
-    click.echo('Compiling glow project')
+    import generate_data_sources
+    click.echo('Fetching glow definitions')
+    datasources = generate_data_sources.generate_datasources_yaml()
+    click.echo('{} data sources fetched'.format(len(datasources)))
 
 @cli.command()
 def compile():
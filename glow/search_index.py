@@ -0,0 +1,188 @@
+from typing import List, Dict, Iterable
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+
+SEARCH_INDEX_DIR = 'search'
+MANIFEST_FILENAME = 'manifest.json'
+TERM_SHARD_FILENAME = 'terms_{prefix}.json'
+DOC_SHARD_FILENAME = 'docs_{shard}.json'
+SHARD_PREFIX_LENGTH = 2
+DOC_SHARD_SIZE = 1000
+MIN_TERM_LENGTH = 2
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+ASSET_FILENAMES = ('search.js', 'search.css')
+
+
+def tokenize(text: str) -> List[str]:
+    """ splits text into lowercase search terms.
+    Identifiers such as `task_posted` are split on underscores as well, a query
+    should be tokenized the same way and its terms intersected.
+    """
+    return [term for term in re.split('[^a-z0-9]+', str(text).lower()) if len(term) >= MIN_TERM_LENGTH]
+
+
+def flatten_text(value) -> List[str]:
+    """ returns all keys and scalar values of a nested dict/list structure as strings. """
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        texts = []
+        for key, sub_value in value.items():
+            texts.append(str(key))
+            texts += flatten_text(sub_value)
+        return texts
+    if isinstance(value, (list, tuple, set)):
+        texts = []
+        for sub_value in value:
+            texts += flatten_text(sub_value)
+        return texts
+    return [str(value)]
+
+
+class SearchIndex():
+    """ inverted index over the generated docs, stored as static json files.
+
+    Terms are sharded by their first SHARD_PREFIX_LENGTH characters into
+    `terms_<prefix>.json` files mapping a term to the sorted ids of the documents
+    containing it. Document titles and urls are stored in `docs_<n>.json` files
+    holding DOC_SHARD_SIZE documents each. A search page only loads the term
+    shards of the query terms and the doc shards of the matching ids; the
+    loader doing so (assets/search.js) and its styles are copied next to the shards.
+
+    The manifest keeps a fingerprint and the terms of every document, so only
+    the postings of documents that changed since the previous run are loaded
+    and rewritten.
+    """
+
+    index_dir = None
+    manifest = None
+
+    def __init__(self, docs_dir: str) -> None:
+        self.index_dir = os.path.join(docs_dir, SEARCH_INDEX_DIR)
+        self.manifest = self._load_json(MANIFEST_FILENAME, {'next_id': 0, 'docs': {}})
+        self._term_shards = {}
+        self._dirty_term_shards = set()
+        self._dirty_doc_shards = set()
+        self._seen = set()
+
+    def _load_json(self, file_name: str, default):
+        file_path = os.path.join(self.index_dir, file_name)
+        if not os.path.isfile(file_path):
+            return default
+        with open(file_path, 'r') as file:
+            return json.load(file)
+
+    def _write_json(self, file_name: str, data) -> None:
+        file_path = os.path.join(self.index_dir, file_name)
+        if not data:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            return
+        with open(file_path, 'w') as file:
+            json.dump(data, file, separators=(',', ':'), sort_keys=True)
+
+    def _get_term_shard(self, prefix: str) -> Dict:
+        if prefix not in self._term_shards:
+            self._term_shards[prefix] = self._load_json(TERM_SHARD_FILENAME.format(prefix=prefix), {})
+        return self._term_shards[prefix]
+
+    def _remove_postings(self, doc_id: int, terms: Iterable[str]) -> None:
+        for term in terms:
+            prefix = term[:SHARD_PREFIX_LENGTH]
+            shard = self._get_term_shard(prefix)
+            postings = shard.get(term, [])
+            position = bisect.bisect_left(postings, doc_id)
+            if position < len(postings) and postings[position] == doc_id:
+                del postings[position]
+            if not postings:
+                shard.pop(term, None)
+            self._dirty_term_shards.add(prefix)
+
+    def update_document(self, key: str, doc_type: str, title: str, url: str, texts: List[str]) -> None:
+        """ adds or updates a single document. Documents whose title, url and texts
+        did not change since the previous run are left untouched.
+        """
+        self._seen.add(key)
+        terms = sorted(set(term for text in [title] + texts for term in tokenize(text)))
+        fingerprint = hashlib.sha1(json.dumps([doc_type, title, url, terms]).encode('UTF-8')).hexdigest()
+
+        doc = self.manifest['docs'].get(key)
+        if doc is not None and doc['hash'] == fingerprint:
+            return
+
+        if doc is None:
+            doc = {'id': self.manifest['next_id']}
+            self.manifest['next_id'] += 1
+            self.manifest['docs'][key] = doc
+        else:
+            self._remove_postings(doc['id'], doc['terms'])
+
+        for term in terms:
+            prefix = term[:SHARD_PREFIX_LENGTH]
+            postings = self._get_term_shard(prefix).setdefault(term, [])
+            # new documents get the highest id so far, only updated documents need to be inserted in order.
+            if not postings or postings[-1] < doc['id']:
+                postings.append(doc['id'])
+            else:
+                bisect.insort(postings, doc['id'])
+            self._dirty_term_shards.add(prefix)
+
+        doc['type'] = doc_type
+        doc['title'] = title
+        doc['url'] = url
+        doc['hash'] = fingerprint
+        doc['terms'] = terms
+        self._dirty_doc_shards.add(doc['id'] // DOC_SHARD_SIZE)
+
+    def remove_missing(self, doc_type: str) -> None:
+        """ removes all documents of the given type that were not updated in this run. """
+        for key in [key for key, doc in self.manifest['docs'].items() if doc['type'] == doc_type and key not in self._seen]:
+            doc = self.manifest['docs'].pop(key)
+            self._remove_postings(doc['id'], doc['terms'])
+            self._dirty_doc_shards.add(doc['id'] // DOC_SHARD_SIZE)
+
+    def _copy_assets(self) -> None:
+        for file_name in ASSET_FILENAMES:
+            with open(os.path.join(ASSETS_DIR, file_name), 'r') as file:
+                asset = file.read()
+            file_path = os.path.join(self.index_dir, file_name)
+            if os.path.isfile(file_path):
+                with open(file_path, 'r') as file:
+                    if file.read() == asset:
+                        continue
+            with open(file_path, 'w') as file:
+                file.write(asset)
+
+    def flush(self) -> None:
+        """ writes the term and doc shards changed since the last flush and frees the loaded
+        term shards. The manifest is only written by save, so flushing stays cheap when done often.
+        """
+        if not os.path.isdir(self.index_dir):
+            os.makedirs(self.index_dir)
+
+        for prefix in self._dirty_term_shards:
+            self._write_json(TERM_SHARD_FILENAME.format(prefix=prefix), self._term_shards[prefix])
+
+        doc_shards = {shard: {} for shard in self._dirty_doc_shards}
+        for doc in self.manifest['docs'].values():
+            shard = doc['id'] // DOC_SHARD_SIZE
+            if shard in doc_shards:
+                doc_shards[shard][doc['id']] = [doc['title'], doc['url'], doc['type']]
+        for shard, docs in doc_shards.items():
+            self._write_json(DOC_SHARD_FILENAME.format(shard=shard), docs)
+
+        logging.info('search index flushed: {} term shards and {} doc shards written.'.format(len(self._dirty_term_shards), len(doc_shards)))
+        # drop the loaded shards, they are read again from disk when needed.
+        self._term_shards = {}
+        self._dirty_term_shards = set()
+        self._dirty_doc_shards = set()
+
+    def save(self) -> None:
+        """ writes the manifest and all term and doc shards changed in this run. """
+        self.flush()
+        self._copy_assets()
+        self._write_json(MANIFEST_FILENAME, self.manifest)
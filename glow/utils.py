@@ -1,6 +1,9 @@
 import yaml
 import os
 
+# default templates are shipped in the templates folder of the glow package.
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def get_file(file_path, yaml_format=False):
     if not os.path.isfile(file_path):
         #raise FileNotFoundError
@@ -12,6 +15,16 @@ def get_file(file_path, yaml_format=False):
             result = file.readlines()
     return result
 
+def get_template(main_path, template):
+    """ returns the content of a template of the docs project in main_path.
+    Falls back to the default template shipped with glow when the project does not have it.
+    """
+    file_path = os.path.join(main_path, template)
+    if not os.path.isfile(file_path):
+        file_path = os.path.join(PACKAGE_DIR, template)
+    with open(file_path, 'r') as file:
+        return file.read()
+
 def store_md(md_file, def_type, def_category, def_name, docs_dir):
     file_dir = os.path.join(docs_dir, def_type, def_category)
     file_name = def_name + '.md'
@@ -0,0 +1,64 @@
+import column_store as cs
+
+ORDERS = [('id', None, 'integer', 'dimension', None),
+          ('amount', 'Amount', 'real', 'measure', None),
+          ('margin', None, 'real', 'measure', '[amount] - [cost]')]
+CUSTOMERS = [('id', 'Customer ID', 'integer', 'dimension', None)]
+
+
+def _store():
+    store = cs.ColumnStore()
+    store.add_datasource(cs.datasource_key('tableau', 'sales', 'orders'), ORDERS)
+    store.add_datasource(cs.datasource_key('tableau', 'sales', 'empty'), [])
+    store.add_datasource(cs.datasource_key('tableau', 'crm', 'customers'), CUSTOMERS)
+    return store
+
+
+def test_datasource_key_includes_the_connection():
+    assert cs.datasource_key('tableau', 'sales', 'orders') == 'tableau/sales/orders'
+    assert cs.datasource_key(None, 'sales', 'orders') == '/sales/orders'
+
+
+def test_get_columns_returns_the_columns_of_one_datasource():
+    store = _store()
+
+    assert store.get_columns('tableau/sales/orders') == [
+        {'name': 'id', 'datatype': 'integer', 'role': 'dimension'},
+        {'name': 'amount', 'datatype': 'real', 'role': 'measure', 'caption': 'Amount'},
+        {'name': 'margin', 'datatype': 'real', 'role': 'measure', 'formula': '[amount] - [cost]'},
+    ]
+    assert store.get_columns('tableau/sales/empty') == []
+    assert store.get_columns('tableau/sales/unknown') == []
+    assert len(store) == 4
+
+
+def test_find_returns_columns_across_datasources():
+    store = _store()
+
+    assert store.find('id') == [
+        ('tableau/sales/orders', {'name': 'id', 'datatype': 'integer', 'role': 'dimension'}),
+        ('tableau/crm/customers', {'name': 'id', 'datatype': 'integer', 'role': 'dimension', 'caption': 'Customer ID'}),
+    ]
+    assert store.find('unknown') == []
+
+
+def test_duplicate_datasources_keep_the_first_columns():
+    store = _store()
+    store.add_datasource(cs.datasource_key('tableau', 'sales', 'orders'), [('id', 'Duplicate', 'string', 'dimension', None)])
+
+    assert len(store) == 4
+    assert [datasource for datasource, _ in store.find('id')] == ['tableau/sales/orders', 'tableau/crm/customers']
+    assert store.get_columns('tableau/sales/orders')[0] == {'name': 'id', 'datatype': 'integer', 'role': 'dimension'}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    file_path = str(tmp_path / ('tableau' + cs.COLUMNS_FILE_SUFFIX))
+    _store().save(file_path)
+
+    store = cs.ColumnStore()
+    store.load(file_path)
+
+    assert store.datasources == ['tableau/sales/orders', 'tableau/sales/empty', 'tableau/crm/customers']
+    assert store.offsets.tolist() == [0, 3, 3, 4]
+    assert store.get_columns('tableau/sales/orders') == _store().get_columns('tableau/sales/orders')
+    assert store.find('id') == _store().find('id')
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+import yaml
+
+import column_store as cs
+import generate_data_sources
+
+
+@pytest.fixture
+def main_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_data_sources, 'MAIN_PATH', str(tmp_path))
+    with open(os.path.join(str(tmp_path), generate_data_sources.CONNECTIONS_CONF_FILE), 'w') as file:
+        yaml.dump({'connections': {'tableau': {'type': 'tableau'}, 'looker': {'type': 'looker'}}}, file)
+    return tmp_path
+
+
+def _write_definitions(main_path, connection_name, names):
+    ds_dir = os.path.join(str(main_path), generate_data_sources.DS_DIR)
+    os.makedirs(ds_dir, exist_ok=True)
+    with open(os.path.join(ds_dir, connection_name + '.yml'), 'w') as file:
+        yaml.dump([{'data_source_name': name, 'data_source_project': 'sales', 'data_source_connection': connection_name} for name in names], file)
+    columns = cs.ColumnStore()
+    for name in names:
+        columns.add_datasource(cs.datasource_key(connection_name, 'sales', name), [('id', None, 'integer', 'dimension', None)])
+    columns.save(os.path.join(ds_dir, connection_name + cs.COLUMNS_FILE_SUFFIX))
+
+
+def test_local_definitions_only_include_configured_connections(main_path):
+    _write_definitions(main_path, 'tableau', ['orders'])
+    _write_definitions(main_path, 'removed', ['old'])
+    connection_names = list(generate_data_sources.get_connections().keys())
+
+    datasources = generate_data_sources.get_datasource_definitions(connection_names)
+    columns = generate_data_sources.get_datasource_columns(connection_names)
+
+    assert [datasource['data_source_name'] for datasource in datasources] == ['orders']
+    assert columns.datasources == ['tableau/sales/orders']
+
+
+def test_local_definitions_fall_back_to_the_legacy_file(main_path):
+    os.makedirs(os.path.join(str(main_path), 'definitions'))
+    with open(os.path.join(str(main_path), generate_data_sources.LEGACY_DS_FILE), 'w') as file:
+        yaml.dump([{'data_source_name': 'legacy'}], file)
+
+    assert generate_data_sources.get_datasource_definitions(['tableau']) == [{'data_source_name': 'legacy'}]
+
+
+def test_generate_datasources_yaml_uses_the_previous_file_of_failed_connections(main_path, monkeypatch):
+    _write_definitions(main_path, 'tableau', ['orders'])
+    monkeypatch.setattr(generate_data_sources.registry, 'run_connections',
+                        lambda connections, store_dir: {'tableau': 'timeout', 'looker': 'failed'})
+
+    datasources = generate_data_sources.generate_datasources_yaml()
+
+    assert [datasource['data_source_name'] for datasource in datasources] == ['orders']
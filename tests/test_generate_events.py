@@ -0,0 +1,152 @@
+import argparse
+import io
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('git')
+pytest.importorskip('pandas')
+pytest.importorskip('snowflake.connector')
+
+import generate_events
+import UsageChartGenerator
+
+MODELS = {
+    'task': [{'parameter_name': 'task_id', 'type': 'string', 'description': 'id of the task', 'allowed': []}],
+    'user': [{'parameter_name': 'user_id', 'type': 'string', 'description': 'id of the user', 'allowed': []}],
+}
+EVENT = {'name': 'task_posted', 'description': 'a task was posted', 'category': 'tasks', 'models': ['task', 'unknown']}
+
+
+def test_build_model_index_links_model_pages():
+    assert generate_events.build_model_index(MODELS) == {
+        'task': {'name': 'task', 'link': '../../models/task.md'},
+        'user': {'name': 'user', 'link': '../../models/user.md'},
+    }
+
+
+def test_get_model_links_skips_unknown_models():
+    model_index = generate_events.build_model_index(MODELS)
+
+    assert generate_events._get_model_links(EVENT, model_index) == [{'name': 'task', 'link': '../../models/task.md'}]
+    assert generate_events._get_model_links({'name': 'no_models'}, model_index) == []
+
+
+def test_generate_model_markdown_uses_default_template(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_events, 'MAIN_PATH', str(tmp_path))
+
+    model_md = generate_events.generate_model_markdown('task', MODELS['task'])
+
+    assert model_md.startswith('---\nmodel_name: task\n')
+    assert '{{ model_name }}' in model_md
+
+
+def _write_event_template(tmp_path, content):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'event.md').write_text(content)
+
+
+def test_generate_markdown_links_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_events, 'MAIN_PATH', str(tmp_path))
+    monkeypatch.setattr(generate_events, 'ENABLE_SQL_QUERIES', False)
+    _write_event_template(tmp_path, '---\n{<yaml_header>}---\n{% for model in models %}{{ model.link }}{% endfor %}\n')
+
+    event_md = generate_events.generate_markdown('task_posted', EVENT, {}, generate_events.build_model_index(MODELS), MODELS)
+
+    assert 'link: ../../models/task.md' in event_md
+    assert 'model_properties' not in event_md
+
+
+def test_generate_markdown_keeps_model_properties_for_old_templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_events, 'MAIN_PATH', str(tmp_path))
+    monkeypatch.setattr(generate_events, 'ENABLE_SQL_QUERIES', False)
+    _write_event_template(tmp_path, '---\n{<yaml_header>}---\n{% for name, props in model_properties.items() %}{{ name }}{% endfor %}\n')
+
+    event_md = generate_events.generate_markdown('task_posted', EVENT, {}, generate_events.build_model_index(MODELS), MODELS)
+
+    assert 'model_properties:\n  task:\n  - allowed: []' in event_md
+    assert 'user_id' not in event_md
+
+
+def _read_events(text):
+    return list(generate_events._iter_yaml_mapping(io.StringIO(text)))
+
+
+def test_iter_yaml_mapping_yields_events_with_their_lines():
+    events = _read_events('a:\n  name: a\n  description: x\n\nb:\n  name: b\n  description: y\n')
+
+    assert events == [('a', {'name': 'a', 'description': 'x'}, 1, 4),
+                      ('b', {'name': 'b', 'description': 'y'}, 5, 3)]
+
+
+def test_iter_yaml_mapping_counts_the_last_line_without_newline():
+    assert [event[2:] for event in _read_events('a:\n  name: a\n  description: x\n\nb:\n  name: b\n  description: y')] == [(1, 4), (5, 3)]
+
+
+def test_iter_yaml_mapping_counts_single_line_values():
+    events = _read_events('a: &x {name: a}\nb: *x\nc: {name: c}\n')
+
+    assert events == [('a', {'name': 'a'}, 1, 1), ('b', {'name': 'a'}, 2, 1), ('c', {'name': 'c'}, 3, 1)]
+
+
+@pytest.mark.parametrize('text', ['', '---\n', '---\n...\n', '# no events yet\n'])
+def test_iter_yaml_mapping_reads_empty_documents(text):
+    assert _read_events(text) == []
+
+
+def test_iter_yaml_mapping_rejects_other_documents():
+    with pytest.raises(SystemExit):
+        _read_events('- a\n- b\n')
+
+
+def test_last_modified_info_skips_empty_line_ranges():
+    assert generate_events._get_last_modified_info_for_lines(3, 0) == ('', '', '')
+
+
+def test_main_streaming_looks_up_history_on_worker_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_events, 'MAIN_PATH', str(tmp_path))
+    monkeypatch.setattr(generate_events, 'ENABLE_SQL_QUERIES', False)
+    monkeypatch.setattr(generate_events, 'USAGE_BATCH_SIZE', 2)
+    monkeypatch.setattr(generate_events, 'clone_ed_repo', lambda: None)
+    monkeypatch.setattr(generate_events, 'get_model_definitions', lambda: {})
+    events = [('e{}'.format(i), {'name': 'e{}'.format(i), 'description': '', 'category': 'tasks'}, i + 1, 1) for i in range(5)]
+    monkeypatch.setattr(generate_events, 'iter_event_definitions', lambda: iter(events))
+    threads = []
+
+    def get_event_history(event_key, repo, event_lines=None):
+        threads.append(threading.current_thread())
+        return {'last_modified_date': 'line {}'.format(event_lines[0])}
+    monkeypatch.setattr(generate_events, 'get_event_history', get_event_history)
+    _write_event_template(tmp_path, '---\n{<yaml_header>}---\n')
+
+    generate_events.main_streaming(argparse.Namespace(docs_dir=str(tmp_path / 'docs')))
+
+    assert threading.main_thread() not in threads
+    assert len(threads) == 5
+    assert 'last_modified_date: line 5' in (tmp_path / 'docs' / 'events' / 'tasks' / 'e4.md').read_text()
+
+
+def test_staged_usage_is_aligned_to_the_weeks_of_all_batches(tmp_path):
+    staging_dir = tmp_path / 'staging'
+    staging_dir.mkdir()
+    generate_events.stage_usage_data('tasks', {'weeks': ['04/01/2021', '11/01/2021', '18/01/2021'],
+                                               'events': {'task_posted': [1, 2, 3]}}, str(staging_dir))
+    generate_events.stage_usage_data('tasks', {'weeks': ['28/12/2020', '11/01/2021'],
+                                               'events': {'task_rare': [7, 8]}}, str(staging_dir))
+
+    generate_events.store_staged_usage_data(str(staging_dir), str(tmp_path / 'docs'), set())
+
+    with open(tmp_path / 'docs' / 'usage' / 'tasks.json', 'r') as file:
+        assert json.load(file) == {'weeks': ['28/12/2020', '04/01/2021', '11/01/2021', '18/01/2021'],
+                                   'events': {'task_posted': [0, 1, 2, 3], 'task_rare': [7, 0, 8, 0]}}
+
+
+def test_usage_chart_uses_default_lazy_template(monkeypatch, tmp_path):
+    monkeypatch.setattr(UsageChartGenerator, 'MAIN_PATH', str(tmp_path))
+
+    chart = generate_events._get_usage_chart({'name': 'task_posted', 'category': 'tasks'})
+
+    assert "fetch('../../usage/tasks.json')" in chart
+    assert "usage.events['task_posted']" in chart
+    assert '{{' not in chart and '{%' not in chart
@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+import yaml
+
+from connectors import registry
+
+
+class OkConnector(registry.Connector):
+
+    def __init__(self, region=None) -> None:
+        self.region = region
+
+    def fetch_definitions(self):
+        return [{'data_source_name': 'orders', 'data_source_connection': self.connection_name, 'region': self.region}]
+
+
+class FailingConnector(registry.Connector):
+
+    def fetch_definitions(self):
+        raise RuntimeError('connection refused')
+
+
+class SlowConnector(registry.Connector):
+
+    def fetch_definitions(self):
+        time.sleep(30)
+        return []
+
+
+class IncompleteConnector(registry.Connector):
+    pass
+
+
+@pytest.fixture
+def connectors(monkeypatch):
+    monkeypatch.setattr(registry, '_get_entry_points', lambda: {})
+    monkeypatch.setattr(registry, 'BUILTIN_CONNECTORS', {
+        'ok': 'test_registry:OkConnector',
+        'failing': 'test_registry:FailingConnector',
+        'slow': 'test_registry:SlowConnector',
+        'incomplete': 'test_registry:IncompleteConnector',
+    })
+
+
+class FakeEntryPoint():
+
+    def load(self):
+        return FailingConnector
+
+
+def test_load_connector_prefers_entry_points(connectors, monkeypatch):
+    assert registry.load_connector('ok') is OkConnector
+
+    monkeypatch.setattr(registry, '_get_entry_points', lambda: {'ok': FakeEntryPoint()})
+    assert registry.load_connector('ok') is FailingConnector
+
+
+def test_load_connector_raises_for_unknown_types(connectors):
+    with pytest.raises(registry.ConnectorNotFoundError, match='Available types: failing, incomplete, ok, slow'):
+        registry.load_connector('looker')
+
+
+def test_run_connections_reports_the_status_of_every_connection(connectors, tmp_path):
+    status = registry.run_connections({
+        'main': {'type': 'ok', 'region': 'eu', 'timeout': 30},
+        'broken': {'type': 'failing'},
+        'hanging': {'type': 'slow', 'timeout': 1},
+        'unknown': {'type': 'looker'},
+        'partial': {'type': 'incomplete'},
+    }, str(tmp_path))
+
+    assert status == {'main': 'success', 'broken': 'failed', 'hanging': 'timeout', 'unknown': 'failed', 'partial': 'failed'}
+    with open(os.path.join(str(tmp_path), 'main.yml'), 'r') as file:
+        assert yaml.safe_load(file) == [{'data_source_name': 'orders', 'data_source_connection': 'main', 'region': 'eu'}]
+    assert sorted(os.listdir(str(tmp_path))) == ['main.yml']
+
+
+def test_run_connections_keeps_the_previous_file_of_a_failed_connection(connectors, tmp_path):
+    (tmp_path / 'broken.yml').write_text('- data_source_name: previous\n')
+
+    assert registry.run_connections({'broken': {'type': 'failing'}}, str(tmp_path)) == {'broken': 'failed'}
+    assert (tmp_path / 'broken.yml').read_text() == '- data_source_name: previous\n'
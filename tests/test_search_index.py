@@ -0,0 +1,115 @@
+import json
+import os
+
+import search_index
+
+
+def _read(index_dir, file_name):
+    with open(os.path.join(index_dir, file_name), 'r') as file:
+        return json.load(file)
+
+
+def _build(docs_dir, documents, doc_type='event'):
+    index = search_index.SearchIndex(str(docs_dir))
+    for key, title, texts in documents:
+        index.update_document(key, doc_type, title, key + '.html', texts)
+    index.remove_missing(doc_type)
+    index.save()
+    return index
+
+
+def test_tokenize_splits_identifiers():
+    assert search_index.tokenize('Task_Posted by a poster') == ['task', 'posted', 'by', 'poster']
+
+
+def test_save_writes_shards_docs_and_assets(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', ['A task was posted'])])
+    index_dir = tmp_path / 'search'
+
+    assert _read(index_dir, 'terms_ta.json') == {'task': [0]}
+    assert _read(index_dir, 'terms_po.json') == {'posted': [0]}
+    assert _read(index_dir, 'docs_0.json') == {'0': ['task_posted', 'a.html', 'event']}
+    for file_name in search_index.ASSET_FILENAMES:
+        assert (index_dir / file_name).is_file()
+
+
+def test_update_document_reposts_changed_terms(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', ['offer']), ('b', 'offer_made', [])])
+    _build(tmp_path, [('a', 'task_posted', ['review']), ('b', 'offer_made', [])])
+    index_dir = tmp_path / 'search'
+
+    assert _read(index_dir, 'terms_of.json') == {'offer': [1]}
+    assert _read(index_dir, 'terms_re.json') == {'review': [0]}
+    assert _read(index_dir, 'manifest.json')['docs']['a']['id'] == 0
+
+
+def test_unchanged_documents_are_not_rewritten(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', []), ('b', 'offer_made', [])])
+    index_dir = tmp_path / 'search'
+    os.remove(index_dir / 'terms_ta.json')
+    os.remove(index_dir / 'docs_0.json')
+
+    _build(tmp_path, [('a', 'task_posted', []), ('b', 'offer_made', ['review'])])
+
+    assert not (index_dir / 'terms_ta.json').exists()
+    assert _read(index_dir, 'terms_re.json') == {'review': [1]}
+    assert _read(index_dir, 'docs_0.json') == {'0': ['task_posted', 'a.html', 'event'],
+                                               '1': ['offer_made', 'b.html', 'event']}
+
+
+def test_remove_missing_drops_postings_and_empty_shards(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', []), ('b', 'offer_made', [])])
+    _build(tmp_path, [('a', 'task_posted', [])])
+    index_dir = tmp_path / 'search'
+
+    assert not (index_dir / 'terms_of.json').exists()
+    assert not (index_dir / 'terms_ma.json').exists()
+    assert _read(index_dir, 'docs_0.json') == {'0': ['task_posted', 'a.html', 'event']}
+    assert list(_read(index_dir, 'manifest.json')['docs'].keys()) == ['a']
+
+
+def test_remove_missing_only_touches_its_doc_type(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', [])], doc_type='event')
+    _build(tmp_path, [('ds', 'orders', [])], doc_type='data source')
+    index_dir = tmp_path / 'search'
+
+    assert _read(index_dir, 'terms_ta.json') == {'task': [0]}
+    assert _read(index_dir, 'terms_or.json') == {'orders': [1]}
+
+
+def test_doc_shards_only_rewrite_the_changed_block(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, 'DOC_SHARD_SIZE', 2)
+    _build(tmp_path, [('a', 'alpha', []), ('b', 'beta', []), ('c', 'gamma', [])])
+    index_dir = tmp_path / 'search'
+    os.remove(index_dir / 'docs_0.json')
+
+    _build(tmp_path, [('a', 'alpha', []), ('b', 'beta', []), ('c', 'gamma', ['delta'])])
+
+    assert not (index_dir / 'docs_0.json').exists()
+    assert _read(index_dir, 'docs_1.json') == {'2': ['gamma', 'c.html', 'event']}
+
+
+def test_flush_writes_shards_without_manifest(tmp_path):
+    index = search_index.SearchIndex(str(tmp_path))
+    index.update_document('a', 'event', 'task_posted', 'a.html', [])
+    index.flush()
+    index_dir = tmp_path / 'search'
+
+    assert _read(index_dir, 'terms_ta.json') == {'task': [0]}
+    assert not (index_dir / 'manifest.json').exists()
+
+    index.update_document('b', 'event', 'task_assigned', 'b.html', [])
+    index.save()
+
+    assert _read(index_dir, 'terms_ta.json') == {'task': [0, 1]}
+    assert sorted(_read(index_dir, 'manifest.json')['docs'].keys()) == ['a', 'b']
+
+
+def test_updated_documents_keep_postings_sorted(tmp_path):
+    _build(tmp_path, [('a', 'task_posted', []), ('b', 'task_assigned', ['offer']), ('c', 'offer_made', [])])
+    _build(tmp_path, [('a', 'task_posted', ['offer']), ('b', 'task_assigned', ['offer']), ('c', 'offer_made', [])])
+    index_dir = tmp_path / 'search'
+
+    assert _read(index_dir, 'terms_of.json') == {'offer': [0, 1, 2]}
+    assert _read(index_dir, 'manifest.json')['docs']['a']['terms'] == ['offer', 'posted', 'task']
+
@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('snowflake.connector')
+
+import SnowflakeQuery as sql
+
+
+class FakeCursor():
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = 'query-1'
+
+    def execute_async(self, query):
+        self.connection.queries.append(query)
+
+    def get_results_from_sfqid(self, query_id):
+        raise RuntimeError('result expired')
+
+    def close(self):
+        pass
+
+
+class FakeConnection():
+
+    def __init__(self):
+        self.queries = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id):
+        return 'SUCCESS'
+
+    def is_still_running(self, status):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+def test_failed_connection_logs_the_error(monkeypatch, caplog):
+    def connect(self):
+        raise RuntimeError('account locked')
+    monkeypatch.setattr(sql.SnowflakeQuery, '_connect', connect)
+
+    with caplog.at_level(logging.ERROR):
+        assert sql.SnowflakeQuery().submit_query('select 1') is None
+
+    assert caplog.records[0].getMessage() == 'Unexpected Snowflake error'
+    assert 'account locked' in caplog.text
+
+
+def test_failed_fetch_closes_the_connection(monkeypatch, caplog):
+    connection = FakeConnection()
+    monkeypatch.setattr(sql.SnowflakeQuery, '_connect', lambda self: connection)
+    query = sql.SnowflakeQuery()
+
+    with caplog.at_level(logging.ERROR):
+        query_id = query.submit_query('select 1')
+        assert query.fetch_query_results(query_id) is None
+
+    assert query_id == 'query-1'
+    assert connection.closed
+    assert 'result expired' in caplog.text
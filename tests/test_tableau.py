@@ -0,0 +1,16 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+tableau = pytest.importorskip('connectors.tableau.tableau')
+
+
+def test_get_columns_strips_only_the_outer_brackets():
+    tree = ET.fromstring('<datasource>'
+                         '<column name="[Foo [x]]" caption="Foo" datatype="string" role="dimension"/>'
+                         '<column name="[Margin]" datatype="real" role="measure"><calculation formula="[a] - [b]"/></column>'
+                         '</datasource>')
+    connector = tableau.TableauConnector('http://localhost/', 'site', 'user', 'pw')
+
+    assert list(connector._get_columns(tree)) == [('Foo [x]', 'Foo', 'string', 'dimension', None),
+                                                  ('Margin', None, 'real', 'measure', '[a] - [b]')]
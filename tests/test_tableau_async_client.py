@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import os
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from connectors.tableau import tableau_async_client as atc
+
+SIGN_IN = '<tsResponse xmlns="http://tableau.com/api"><credentials token="token-1"><site id="site-1"/></credentials></tsResponse>'
+TDS = '<datasource><column name="[Order ID]" datatype="integer" role="dimension"/></datasource>'
+
+
+def _datasource(datasource_id):
+    return ('<datasource id="{id}" name="ds {id}" createdAt="2021-03-04T05:06:07Z" updatedAt="2021-03-05T05:06:07Z" hasExtracts="false">'
+            '<project name="sales"/><owner id="user-1"/></datasource>').format(id=datasource_id)
+
+
+def _app(datasource_count=5, failing_downloads=()):
+    """ a fake Tableau REST API serving datasource_count data sources over pages of PAGE_SIZE. """
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        path = request.path
+        if path.endswith('/auth/signin'):
+            if 'wrong' in await request.text():
+                return web.Response(status=401)
+            return web.Response(text=SIGN_IN)
+        if path.endswith('/auth/signout'):
+            return web.Response(status=204)
+        assert request.headers['X-Tableau-Auth'] == 'token-1'
+        if path.endswith('/datasources'):
+            page_size, page_number = int(request.query['pageSize']), int(request.query['pageNumber'])
+            ids = range((page_number - 1) * page_size, min(page_number * page_size, datasource_count))
+            return web.Response(text='<tsResponse><pagination totalAvailable="{}"/><datasources>{}</datasources></tsResponse>'.format(
+                datasource_count, ''.join(_datasource(datasource_id) for datasource_id in ids)))
+        if path.endswith('/users'):
+            return web.Response(text='<tsResponse><pagination totalAvailable="1"/><users><user id="user-1" name="tom"/></users></tsResponse>')
+        if path.endswith('/extractRefreshes'):
+            return web.Response(text='<tsResponse><pagination totalAvailable="0"/><tasks/></tsResponse>')
+        if path.endswith('/connections'):
+            return web.Response(text='<tsResponse><connections><connection id="c" type="snowflake" userName="loader"/></connections></tsResponse>')
+        if path.endswith('/content'):
+            if path.split('/')[-2] in failing_downloads:
+                return web.Response(status=500)
+            return web.Response(text=TDS)
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    return app, requests
+
+
+async def _with_server(app, run):
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        return await run(str(server.make_url('/')))
+    finally:
+        await server.close()
+
+
+def test_parse_datetime_returns_utc():
+    client = atc.AsyncTableauClient('http://localhost/', 'site', 'user', 'pw')
+    assert client._parse_datetime('2021-03-04T05:06:07Z') == datetime.datetime(2021, 3, 4, 5, 6, 7, tzinfo=datetime.timezone.utc)
+    assert client._parse_datetime(None) is None
+
+
+def test_get_datasources_requests_all_pages(monkeypatch):
+    monkeypatch.setattr(atc, 'PAGE_SIZE', 2)
+    app, requests = _app(datasource_count=5)
+
+    async def run(url):
+        async with atc.AsyncTableauClient(url, 'site', 'user', 'pw') as client:
+            assert (client.token, client.site_id) == ('token-1', 'site-1')
+            return await client.get_datasources()
+
+    datasources = asyncio.run(_with_server(app, run))
+
+    assert [datasource['id'] for datasource in datasources] == ['0', '1', '2', '3', '4']
+    assert datasources[0]['project_name'] == 'sales'
+    assert datasources[0]['owner_id'] == 'user-1'
+    assert datasources[0]['created_at'] == datetime.datetime(2021, 3, 4, 5, 6, 7, tzinfo=datetime.timezone.utc)
+    assert sorted(request.query['pageNumber'] for request in requests if request.path.endswith('/datasources')) == ['1', '2', '3']
+
+
+def test_failed_sign_in_closes_session():
+    app, _ = _app()
+    client = None
+
+    async def run(url):
+        nonlocal client
+        client = atc.AsyncTableauClient(url, 'site', 'user', 'wrong')
+        async with client:
+            pass
+
+    with pytest.raises(atc.TableauException):
+        asyncio.run(_with_server(app, run))
+    assert client._session.closed
+
+
+def test_download_datasource_streams_to_file(tmp_path):
+    app, _ = _app()
+
+    async def run(url):
+        async with atc.AsyncTableauClient(url, 'site', 'user', 'pw') as client:
+            return await client.download_datasource('ds-1', str(tmp_path / 'ds-1'))
+
+    file_path = asyncio.run(_with_server(app, run))
+
+    with open(file_path, 'r') as file:
+        assert file.read() == TDS
+
+
+def test_fetch_datasources_async_skips_failed_datasources(tmp_path, monkeypatch):
+    tableau = pytest.importorskip('connectors.tableau.tableau')
+    monkeypatch.setattr(tableau, 'TEMP_PATH', str(tmp_path))
+    app, _ = _app(datasource_count=3, failing_downloads=('1',))
+
+    async def run(url):
+        connector = tableau.TableauConnector(url, 'site', 'user', 'pw', use_async=True)
+        connector.connection_name = 'tableau'
+        return connector, await connector.fetch_datasources_async()
+
+    connector, datasources = asyncio.run(_with_server(app, run))
+
+    assert [datasource['data_source_name'] for datasource in datasources] == ['ds 0', 'ds 2']
+    assert datasources[0]['data_source_owner'] == {'name': 'tom'}
+    assert datasources[0]['data_source_materialisation']['db_username'] == 'loader'
+    assert sorted(connector.column_store.datasources) == ['tableau/sales/ds 0', 'tableau/sales/ds 2']
+    assert os.listdir(os.path.join(str(tmp_path), tableau.TABLEAU_PATH)) == []